@@ -0,0 +1,227 @@
+# ========================================================= #
+# ====================== Benchmarks ======================= #
+# ========================================================= #
+
+# Times the hot paths of the ipd package and appends
+# the results to a JSON history file, to compare versions:
+#
+#   python3 benchmark.py                 # full suite
+#   python3 benchmark.py --quick         # smaller workloads
+#   python3 benchmark.py --only export   # workloads whose name contains "export"
+#   python3 benchmark.py --check         # only the checks of the match backends
+#
+# Each record of the history holds the date, the git commit, the versions
+# of Python and numpy, and for every workload its best wall time over
+# --repeat runs (plus a throughput when it makes sense).
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def load_ipd():
+    # The package next to this file, whatever the working directory
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    import ipd
+    return ipd
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def timed(func, repeat):
+    # Best wall time of `repeat` runs
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+# ================== Workloads ================== #
+# Each workload is (name, function to time, rounds played or None)
+
+def random_population(ipd, n, seed=0):
+    rng = np.random.default_rng(seed)
+    registry = ipd.StrategyRegistry()
+    registry.add_many(rng.random((n, 2, 2)), rng.random(n))
+    return registry
+
+def workloads(ipd, quick):
+    sizes = [10, 50] if quick else [10, 50, 100]
+    rounds = [1000] if quick else [1000, 10000]
+    long_match = 10**5 if quick else 10**6
+    res = []
+
+    res.append(("iterated_game %d rounds" % long_match,
+                lambda: ipd.iterated_game(long_match, ipd.strat_prudent, ipd.random_strat),
+                long_match))
+
+    res.append(("iterated_game kernel %d rounds" % long_match,
+                lambda: ipd.iterated_game(long_match, ipd.strat_prudent, ipd.random_strat, backend="kernel"),
+                long_match))
+
+    n = len(ipd.liste_strat)
+    for nb in rounds:
+        res.append(("results_strategies liste_strat %d rounds" % nb,
+                    lambda nb=nb: [ipd.results_strategies(strat, nb) for strat in ipd.liste_strat],
+                    n*n*nb))
+
+    for size in sizes:
+        population = random_population(ipd, size)
+        pairs = size*(size+1)//2
+        for nb in rounds:
+            res.append(("round_robin N=%d %d rounds" % (size, nb),
+                        lambda p=population, nb=nb: ipd.round_robin(p, nb),
+                        pairs*nb))
+            res.append(("round_robin exact N=%d %d rounds" % (size, nb),
+                        lambda p=population, nb=nb: ipd.round_robin(p, nb, exact=True),
+                        None))
+
+    for size in sizes:
+        population = random_population(ipd, size)
+        scores, _ = ipd.round_robin(population, 100, exact=True)
+        res.append(("export_tournament N=%d" % size,
+                    lambda p=population, s=scores: _export(ipd, p, s),
+                    None))
+    res.append(("create_sheets liste_strat 100 rounds",
+                lambda: _create_sheets(ipd),
+                None))
+    return res
+
+def _export(ipd, population, scores):
+    with tempfile.TemporaryDirectory() as tmp:
+        ipd.export_tournament(population, 100, scores=scores, path=os.path.join(tmp, "tournament"))
+
+def _create_sheets(ipd):
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            ipd.create_sheets(ipd.liste_strat, ipd.liste_strat, 100)
+        finally:
+            os.chdir(cwd)
+
+# ================== Kernel backends ================== #
+
+def check_kernel(ipd, nb_of_games=10**5, seed=0):
+    # The compiled and the plain Python versions of the match kernel must
+    # count the same joint moves from the same draws. Returns None without
+    # Numba.
+    from ipd.kernel import compiled_kernel, kernel_states
+    if compiled_kernel() is None:
+        return None
+    for (strat_a, strat_b) in [(ipd.strat_prudent, ipd.random_strat), (ipd.strat_maitrise, ipd.strat_extorque),
+                               (ipd.tit_for_two_tats, ipd.strat_conciliant)]:
+        (table_a, table_b, memory) = ipd.memory_tables(strat_a, strat_b)
+        args = (nb_of_games, table_a, table_b, memory, strat_a["first"], strat_b["first"],
+                ipd.strategies._padding_state(memory))
+        counts = [kernel_states(*args, np.random.default_rng(seed), jit=jit) for jit in (True, False)]
+        if not np.array_equal(counts[0], counts[1]):
+            raise AssertionError("kernel backends differ for %s vs %s: %s" % (strat_a["name"], strat_b["name"], counts))
+    return True
+
+def check_backends(ipd, nb_of_games=20000, seeds=range(8), z=4):
+    # iterated_game with backend="kernel" and backend="python" use other
+    # draws: over several seeds, their mean scores must agree with each
+    # other and with markov_game, within z standard errors plus the 0.01
+    # truncation of the scores. Raises AssertionError otherwise.
+    pairs = [(ipd.strat_prudent, ipd.random_strat), (ipd.strat_maitrise, ipd.strat_extorque),
+             (ipd.tit_for_tat, ipd.strat_indecis), (ipd.tit_for_two_tats, ipd.strat_conciliant)]
+    for (strat_a, strat_b) in pairs:
+        exact = np.array(ipd.markov_game(strat_a, strat_b, nb_of_games))
+        stats = {}
+        for backend in ("python", "kernel"):
+            res = np.array([ipd.iterated_game(nb_of_games, strat_a, strat_b, seed=seed, backend=backend)
+                            for seed in seeds])
+            stats[backend] = (res.mean(axis=0), res.std(axis=0, ddof=1)/np.sqrt(len(res)))
+        (mean_p, se_p), (mean_k, se_k) = stats["python"], stats["kernel"]
+        checks = [("python", mean_p, exact, z*se_p + 0.01), ("kernel", mean_k, exact, z*se_k + 0.01),
+                  ("python vs kernel", mean_p, mean_k, z*np.hypot(se_p, se_k) + 0.01)]
+        for (label, x, y, tol) in checks:
+            if (np.abs(x - y) > tol).any():
+                raise AssertionError("%s vs %s, %s: %s != %s (tolerance %s)"
+                                     % (strat_a["name"], strat_b["name"], label, x, y, tol))
+    return True
+
+# ================== History ================== #
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+def save_history(path, history):
+    with open(path + ".tmp", "w") as f:
+        json.dump(history, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+def report(results, previous):
+    # One line per workload, with the ratio to the previous record if any
+    before = previous["results"] if previous else {}
+    width = max(len(name) for name in results)
+    for name, res in results.items():
+        line = "%-*s %10.4f s" % (width, name, res["seconds"])
+        if "rounds_per_second" in res:
+            line += "  %12.0f rounds/s" % res["rounds_per_second"]
+        if name in before and res["seconds"] > 0:
+            line += "  x%.2f vs %s" % (before[name]["seconds"]/res["seconds"], previous.get("commit"))
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the iterated prisoner's dilemma code")
+    parser.add_argument("--output", default=os.path.join(HERE, "benchmarks.json"), help="JSON history file")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per workload (best time is kept)")
+    parser.add_argument("--quick", action="store_true", help="smaller workloads")
+    parser.add_argument("--only", default=None, help="only the workloads whose name contains this text")
+    parser.add_argument("--no-save", action="store_true", help="do not write the history file")
+    parser.add_argument("--check", action="store_true", help="only run the checks of the backends")
+    args = parser.parse_args(argv)
+
+    ipd = load_ipd()
+    checked = check_kernel(ipd)
+    print("match kernel: " + ("compiled and plain Python kernels count the same moves" if checked
+                              else "numba not installed, compiled kernel not checked"))
+    check_backends(ipd)
+    print("backends: kernel and python agree with markov_game")
+    if args.check:
+        return None
+    results = {}
+    for (name, func, rounds) in workloads(ipd, args.quick):
+        if args.only and args.only not in name:
+            continue
+        seconds = timed(func, args.repeat)
+        results[name] = {"seconds": seconds}
+        if rounds:
+            results[name]["rounds_per_second"] = rounds/seconds
+
+    history = load_history(args.output)
+    report(results, history[-1] if history else None)
+    record = {"date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "commit": git_commit(),
+              "python": platform.python_version(),
+              "numpy": np.__version__,
+              "machine": platform.machine(),
+              "quick": args.quick,
+              "results": results}
+    if not args.no_save:
+        history.append(record)
+        save_history(args.output, history)
+    return record
+
+if __name__ == "__main__":
+    main()
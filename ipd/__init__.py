@@ -0,0 +1,39 @@
+# ========================================================= #
+# ============== Iterated prisoner's dilemma ============== #
+# ========================================================= #
+
+# The code of english-iterated-prisoners-dilemma.py as a package:
+#
+#   import ipd
+#   ipd.iterated_game(10000, ipd.strat_maitrise, ipd.strat_extorque)
+#
+# Importing it only defines things (no simulation, no print); matplotlib
+# and xlsxwriter are imported when a plot or a workbook is asked for.
+# Command line: python3 -m ipd --help
+
+from .model import initial_game, S, P, R, T, utility_matrix, transpose
+from .strategies import (all_c, all_d, random_strat, strat_indecis, tit_for_tat, resentful, strat_inverse,
+                         strat_conciliant, strat_prudent, strat_inspiree, zd_control_params,
+                         zd_extortion_params, strat_maitrise, strat_extorque, liste_strat, Strategy,
+                         StrategyRegistry, strategy_registry, resolve_strategy, resolve_strategies,
+                         strategy_names, memory_of, memory_n_strategy, memory_tables, tit_for_two_tats,
+                         strategy_arrays, strategy_key)
+from .instrument import Instrumentation, NO_INSTRUMENT
+from .trajectory import TrajectoryRecorder
+from .markov import (transition_matrices, limit_matrix, markov_states, markov_batch_game, markov_game,
+                     memory_markov_game, memory_transition_matrix, score_distribution)
+from .game import match_seed, iterated_game, results_strategies
+from .batch import batch_states, batch_game
+from .tournament import (round_robin, ranking, parallel_round_robin, adaptive_batch_game,
+                         adaptive_game)
+from .tiled import tiled_tournament, tiled_summary, load_checkpoint
+from .approx import approximate_ranking
+from .sources import (StrategySource, RandomStrategies, ParametricStrategies, FileStrategies,
+                      write_strategies)
+from .cache import ResultCache
+from .export import create_sheets, export_tournament
+from .zd import zd_control_sweep, zd_extortion_sweep, source_sweep
+from .payoffs import payoff_grid, utility_matrices, noisy, payoff_noise_sweep, ranking_table
+from .evolution import replicator_dynamics, moran_process
+from .spatial import NEIGHBOURHOODS, random_grid, spatial_scores, spatial_step, spatial_game
+from .server import JobServer, serve, submit, query
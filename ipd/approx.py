@@ -0,0 +1,108 @@
+# ========================================================= #
+# ================== Approximate ranking ================== #
+# ========================================================= #
+
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+from .model import utility_matrix
+from .strategies import strategy_arrays
+from .instrument import NO_INSTRUMENT
+from .batch import batch_game
+from .markov import markov_batch_game
+
+# The mean score of a strategy in round_robin is its mean over all the
+# opponents of the pool. Here it is estimated, like results_strategies
+# does for one strategy, from a sample of opponents drawn uniformly
+# (itself included): every strategy first plays about c*log(N) of them,
+# then the strategies whose confidence interval contains the score that
+# separates the top k from the others get more opponents (twice as many at
+# each refinement), until the top k is settled or the budget of matches
+# is spent. O(N log N) matches instead of the N(N+1)/2 of round_robin.
+# Opponents are drawn with replacement: a strategy that would reach N
+# samples plays the whole pool once instead, which gives its round_robin
+# mean (interval of width 0).
+
+def _play_pairs(nb_of_games, strats, firsts, ia, ib, exact, rng, chunk_size, utility_matrix):
+    # Score of ia[p] against ib[p] (a strategy against itself: mean of
+    # both sides, as in round_robin)
+    res = np.zeros(len(ia))
+    for start in range(0, len(ia), chunk_size):
+        sl = slice(start, start + chunk_size)
+        (a, b) = (ia[sl], ib[sl])
+        if exact:
+            scores = markov_batch_game(nb_of_games, strats[a], firsts[a], strats[b], firsts[b],
+                                       utility_matrix=utility_matrix)
+        else:
+            scores = batch_game(nb_of_games, strats[a], firsts[a], strats[b], firsts[b], rng=rng,
+                                utility_matrix=utility_matrix)
+        res[sl] = np.where(a == b, scores.mean(axis=1), scores[:, 0])
+    return res
+
+def approximate_ranking(strategies, nb_of_games, k=10, c=4.0, exact=False, confidence=0.95, budget=None,
+                        max_refinements=20, seed=None, chunk_size=2**16, utility_matrix=utility_matrix,
+                        instrument=None):
+    # Returns {"mean" (n,), "ci" (n,) half-widths of the confidence
+    # intervals, "samples" (n,) opponents played, "ranking" (n,) best
+    # first, "top" the k best, "settled" (n,) True when the interval is
+    # entirely above or below the top-k boundary, "full" (n,) True for the
+    # strategies scored against the whole pool, "boundary", "matches"}.
+    # budget: at most this many matches (default 4 times the first pass).
+    if instrument is None:
+        instrument = NO_INSTRUMENT
+    rng = np.random.default_rng(seed)
+    strats, firsts = strategy_arrays(strategies)
+    n = len(firsts)
+    k = min(k, n)
+    first_pass = max(2, math.ceil(c*math.log(max(n, 2))))
+    if budget is None:
+        budget = 4*n*first_pass
+    z = NormalDist().inv_cdf((1 + confidence)/2)
+    total, squares, samples = np.zeros(n), np.zeros(n), np.zeros(n, dtype=np.int64)
+    full = np.zeros(n, dtype=bool)
+    extra = np.full(n, first_pass)
+    todo = np.arange(n)
+    matches = 0
+    with instrument.stage("tournament"):
+        for refinement in range(max_refinements + 1):
+            # the new opponents of the strategies of todo, within the budget
+            # (the first pass is always played)
+            if refinement:
+                extra = np.minimum(extra, max(budget - matches, 0) // max(len(todo), 1))
+                if not len(todo) or not extra[todo].any():
+                    break
+            # no more than n samples: the whole pool instead
+            whole = todo[samples[todo] + extra[todo] >= n]
+            sampled = todo[samples[todo] + extra[todo] < n]
+            total[whole], squares[whole], samples[whole] = 0, 0, 0
+            full[whole] = True
+            ia = np.concatenate([np.repeat(whole, n), np.repeat(sampled, extra[sampled])])
+            ib = np.concatenate([np.tile(np.arange(n), len(whole)), rng.integers(0, n, len(ia) - n*len(whole))])
+            scores = _play_pairs(nb_of_games, strats, firsts, ia, ib, exact, rng, chunk_size, utility_matrix)
+            np.add.at(total, ia, scores)
+            np.add.at(squares, ia, scores**2)
+            np.add.at(samples, ia, 1)
+            matches += len(ia)
+            instrument.count("matches", len(ia))
+            if not exact:
+                instrument.count("rounds", len(ia)*nb_of_games)
+            instrument.progress("matches", matches, budget)
+
+            mean = total / samples
+            var = np.maximum(squares / samples - mean**2, 0) * samples / np.maximum(samples - 1, 1)
+            # a strategy whose sampled opponents all gave the same score
+            # still gets the usual spread of the pool
+            spread = (var > 0) & ~full
+            var = np.where(var > 0, var, np.median(var[spread]) if spread.any() else 0)
+            ci = np.where(full, 0, z*np.sqrt(var / samples))
+            ranking = np.argsort(-mean, kind="stable")
+            boundary = mean[ranking[k-1]] if k == n else (mean[ranking[k-1]] + mean[ranking[k]])/2
+            settled = (mean - ci > boundary) | (mean + ci < boundary)
+            if k == n:
+                settled[:] = True
+            todo = np.nonzero(~settled & ~full)[0]
+            extra = samples.copy()
+    return {"mean": mean, "ci": ci, "samples": samples, "ranking": ranking, "top": ranking[:k],
+            "settled": settled, "full": full, "boundary": float(boundary), "matches": matches}
@@ -0,0 +1,71 @@
+# ========================================================= #
+# ================ Batch of iterated games ================ #
+# ========================================================= #
+
+import numpy as np
+
+from .model import utility_matrix
+
+# Plays m matches at once: all the matches advance one round per numpy pass.
+# The joint move (a, b) of a match is stored as the state 2*a + b, so that
+# strat.reshape(4)[state] is strat[a][b] and utility_matrix.reshape(4, 2)[state]
+# is utility_matrix[a][b].
+# A block holds at most block_size rounds and max_draws random numbers, so
+# the memory used does not grow with the number of matches (one round at a
+# time for very large batches). Cutting the rounds in blocks does not
+# change the draws, so the results do not depend on it.
+
+max_draws = 2**22
+
+def _draw_block(rng, k, m):
+    # rng is either one numpy Generator shared by all the matches,
+    # or a sequence of m Generators (one independent stream per match)
+    if isinstance(rng, np.random.Generator):
+        return rng.random((k, 2, m))
+    return np.stack([g.random((k, 2)) for g in rng], axis=-1)
+
+def batch_states(nb_of_games, strats_a, firsts_a, strats_b, firsts_b, rng=None, block_size=1024, instrument=None):
+    # Returns the number of rounds spent in each joint state, shape (m, 4)
+    if rng is None:
+        rng = np.random.default_rng()
+    return _advance_matches(nb_of_games, strats_a, firsts_a, strats_b, firsts_b, None, rng, block_size,
+                            instrument)[0]
+
+def _advance_matches(nb_of_games, strats_a, firsts_a, strats_b, firsts_b, state, rng, block_size, instrument=None):
+    # Plays nb_of_games more rounds of matches currently in the joint states
+    # `state` (None: the matches have not started yet).
+    # Returns the state counts of these rounds and the new states.
+    m = len(firsts_a)
+    rows4 = 4*np.arange(m)
+    # A looks at (a, b), B looks at (b, a): B's table is transposed once
+    flat_a = np.asarray(strats_a, dtype=float).reshape(-1)
+    flat_b = np.asarray(strats_b, dtype=float).transpose(0, 2, 1).reshape(-1)
+    counts = np.zeros(4*m, dtype=np.int64)
+    done = 0
+    block_size = max(1, min(block_size, max_draws // max(2*m, 1)))
+    while done < nb_of_games:
+        k = min(block_size, nb_of_games - done)
+        draws = _draw_block(rng, k, m)
+        states = np.empty((k, m), dtype=np.intp)
+        for i in range(k):
+            if state is None:
+                a = draws[i, 0] >= firsts_a
+                b = draws[i, 1] >= firsts_b
+            else:
+                a = draws[i, 0] >= flat_a[rows4 + state]
+                b = draws[i, 1] >= flat_b[rows4 + state]
+            state = 2*a + b
+            states[i] = state
+        counts += np.bincount((states + rows4).reshape(-1), minlength=4*m)
+        done += k
+        if instrument is not None:
+            instrument.progress("rounds", done, nb_of_games)
+    return counts.reshape(m, 4), state
+
+def batch_game(nb_of_games, strats_a, firsts_a, strats_b, firsts_b, rng=None, block_size=1024, utility_matrix=utility_matrix,
+               instrument=None):
+    # Same results as iterated_game, one line (mean_score_a, mean_score_b) per match
+    counts = batch_states(nb_of_games, strats_a, firsts_a, strats_b, firsts_b, rng=rng, block_size=block_size,
+                          instrument=instrument)
+    gains = counts @ np.reshape(utility_matrix, (4, 2))
+    return np.floor(100*gains/nb_of_games)/100
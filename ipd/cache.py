@@ -0,0 +1,80 @@
+# ========================================================= #
+# ===================== Result cache ====================== #
+# ========================================================= #
+
+import hashlib
+import sqlite3
+
+import numpy as np
+
+# Results of matches stored in a local sqlite file, so that a tournament
+# only plays the pairs it has never seen. The key is a hash of everything
+# the result depends on: the content of both strategies, the utility
+# matrix, the number of rounds, the master seed and the engine.
+# When the file holds more than max_entries results, the least recently
+# used ones are dropped.
+
+class ResultCache:
+
+    def __init__(self, path="ipd_cache.sqlite", max_entries=10**6):
+        self.path = path
+        self.max_entries = max_entries
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS results "
+                        "(key TEXT PRIMARY KEY, score_a REAL, score_b REAL, used INTEGER)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        (self.size, last) = self.db.execute("SELECT COUNT(*), MAX(used) FROM results").fetchone()
+        self.clock = last or 0
+
+    @staticmethod
+    def key(key_a, key_b, nb_of_games, seed, utility_matrix, engine):
+        # key_a, key_b: strategy_key of both strategies
+        h = hashlib.sha256()
+        for part in (key_a, key_b, str(nb_of_games), repr(seed), engine):
+            h.update(part.encode())
+            h.update(b"|")
+        h.update(np.asarray(utility_matrix, dtype=float).tobytes())
+        return h.hexdigest()
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def get_many(self, keys):
+        found = {}
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            rows = self.db.execute("SELECT key, score_a, score_b FROM results WHERE key IN (%s)"
+                                   % ",".join("?"*len(part)), part)
+            for (key, score_a, score_b) in rows:
+                found[key] = (score_a, score_b)
+        if found:
+            self.clock += 1
+            self.db.executemany("UPDATE results SET used = ? WHERE key = ?", [(self.clock, key) for key in found])
+            self.db.commit()
+        return [found.get(key) for key in keys]
+
+    def put(self, key, result):
+        self.put_many([(key, result)])
+
+    def put_many(self, items):
+        self.clock += 1
+        before = self.db.total_changes
+        self.db.executemany("INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?)",
+                            [(key, float(a), float(b), self.clock) for (key, (a, b)) in items])
+        self.size += self.db.total_changes - before
+        if self.size > self.max_entries:
+            self.db.execute("DELETE FROM results WHERE key IN "
+                            "(SELECT key FROM results ORDER BY used LIMIT ?)", (self.size - self.max_entries,))
+            self.size = self.max_entries
+        self.db.commit()
+
+    def clear(self):
+        self.db.execute("DELETE FROM results")
+        self.db.commit()
+        self.size = 0
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        return self.size
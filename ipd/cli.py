@@ -0,0 +1,325 @@
+# ========================================================= #
+# ===================== Command line ====================== #
+# ========================================================= #
+
+# python3 -m ipd match tit_for_tat strat_extorque --rounds 10000 --plot
+# python3 -m ipd tournament --rounds 1000 --workers 4 --seed 1
+# python3 -m ipd tournament --random 100000 --approx 10 --exact --seed 1
+# python3 -m ipd sweep control --p1 0.5 1 51 --p4 0 0.5 51 --output control.npz
+# python3 -m ipd export --rounds 10000 --path tournament
+#
+# A strategy is given by its variable name (tit_for_tat), its name
+# ("Resentful", case insensitive) or its id in strategy_registry (0 to 9
+# for liste_strat). Without strategies, liste_strat is used.
+
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from . import strategies as _strategies
+from .strategies import liste_strat, strategy_registry, strategy_names
+from .instrument import Instrumentation, NO_INSTRUMENT
+
+def find_strategy(text):
+    if text.lstrip("-").isdigit():
+        return strategy_registry[int(text)]
+    value = getattr(_strategies, text, None)
+    if isinstance(value, dict) and "strat" in value:
+        return value
+    names = [name.lower() for name in strategy_registry.names]
+    if text.lower() in names:
+        return strategy_registry[names.index(text.lower())]
+    raise argparse.ArgumentTypeError("unknown strategy: %r" % text)
+
+def _players(args):
+    chunk_size = getattr(args, "tile_size", 4096)
+    if args.file:
+        from .sources import FileStrategies
+        return FileStrategies(args.file, chunk_size=chunk_size)
+    if args.random:
+        from .sources import RandomStrategies
+        return RandomStrategies(args.random, chunk_size=chunk_size, seed=args.seed)
+    # sweep has no positional strategies
+    return getattr(args, "strategies", None) or liste_strat
+
+def _instrument(args):
+    if args.progress or args.summary or args.profile:
+        return Instrumentation(progress=args.progress, profile=args.profile)
+    return NO_INSTRUMENT
+
+def _finish(args, instrument):
+    if instrument is not NO_INSTRUMENT:
+        if args.profile:
+            print(instrument.profile_report(), file=sys.stderr)
+        if args.summary:
+            instrument.write_summary(args.summary)
+
+def _cache(args):
+    if args.cache is None:
+        return None
+    from .cache import ResultCache
+    return ResultCache(args.cache)
+
+def _print_table(names, scores, order):
+    width = max(len(name) for name in names)
+    means = np.mean(scores, axis=1)
+    for (rank, i) in enumerate(order):
+        print("%3d  %-*s  %.4f" % (rank+1, width, names[i], means[i]))
+
+# ================== Commands ================== #
+
+def cmd_match(args):
+    if args.distribution:
+        from .markov import score_distribution
+        res = score_distribution(args.strat_a, args.strat_b, args.rounds)
+        names = strategy_names([args.strat_a, args.strat_b])
+        if args.json:
+            print(json.dumps({"names": names, "rounds": args.rounds, "mean": res["mean"], "var": res["var"],
+                              "win": res["win"], "draw": res["draw"], "loss": res["loss"]}))
+        else:
+            for (k, name) in enumerate(names):
+                print("%s: mean %s, variance %s" % (name, res["mean"][k], res["var"][k]))
+            print("win %s, draw %s, loss %s" % (res["win"], res["draw"], res["loss"]))
+        return
+    if args.exact:
+        from .markov import markov_game
+        res = markov_game(args.strat_a, args.strat_b, args.rounds)
+    else:
+        from .game import iterated_game
+        res = iterated_game(args.rounds, args.strat_a, args.strat_b, display=args.plot, seed=args.seed,
+                            cache=_cache(args), backend=args.backend)
+    names = strategy_names([args.strat_a, args.strat_b])
+    if args.json:
+        print(json.dumps({"names": names, "rounds": args.rounds, "scores": [float(x) for x in res]}))
+    else:
+        print("%s: %s" % (names[0], float(res[0])))
+        print("%s: %s" % (names[1], float(res[1])))
+
+def cmd_tournament(args):
+    from .tournament import round_robin, parallel_round_robin
+    players = _players(args)
+    instrument = _instrument(args)
+    if args.approx:
+        from .approx import approximate_ranking
+        res = approximate_ranking(players, args.rounds, k=args.approx, exact=args.exact, seed=args.seed,
+                                  instrument=instrument)
+        names = strategy_names(players)
+        order = res["top"]
+        if args.json:
+            print(json.dumps({"names": [names[i] for i in order], "rounds": args.rounds,
+                              "mean": [float(res["mean"][i]) for i in order],
+                              "ci": [float(res["ci"][i]) for i in order],
+                              "settled": [bool(res["settled"][i]) for i in order], "matches": res["matches"]}))
+        else:
+            width = max(len(names[i]) for i in order)
+            for (rank, i) in enumerate(order):
+                print("%3d  %-*s  %.4f +- %.4f%s" % (rank+1, width, names[i], res["mean"][i], res["ci"][i],
+                                                    "" if res["settled"][i] else "  ?"))
+            print("%d matches" % res["matches"])
+        _finish(args, instrument)
+        return
+    if args.memmap:
+        from .tiled import tiled_tournament, tiled_summary
+        tiled_tournament(players, args.rounds, path=args.memmap, tile_size=args.tile_size, seed=args.seed,
+                         exact=args.exact, workers=args.workers or 1, instrument=instrument)
+        summary = tiled_summary(args.memmap)
+        names = strategy_names(players)
+        order = summary["ranking"][:args.top]
+        if args.json:
+            print(json.dumps({"names": [names[i] for i in order], "rounds": args.rounds,
+                              "mean": [float(summary["row_mean"][i]) for i in order]}))
+        else:
+            width = max(len(names[i]) for i in order)
+            for (rank, i) in enumerate(order):
+                print("%3d  %-*s  %.4f" % (rank+1, width, names[i], summary["row_mean"][i]))
+        _finish(args, instrument)
+        return
+    if args.exact:
+        scores, order = round_robin(players, args.rounds, exact=True, instrument=instrument)
+    elif args.workers is not None or args.seed is not None or args.cache is not None:
+        scores, order = parallel_round_robin(players, args.rounds, seed=args.seed, workers=args.workers,
+                                             cache=_cache(args), instrument=instrument)
+    else:
+        scores, order = round_robin(players, args.rounds, instrument=instrument)
+    names = strategy_names(players)
+    if args.json:
+        print(json.dumps({"names": names, "rounds": args.rounds, "scores": scores.tolist(),
+                          "ranking": [int(i) for i in order]}))
+    else:
+        _print_table(names, scores, order)
+    _finish(args, instrument)
+
+def cmd_sweep(args):
+    from .zd import zd_control_sweep, zd_extortion_sweep
+    if args.kind == "payoffs":
+        from .payoffs import payoff_grid, payoff_noise_sweep, ranking_table
+        grid = payoff_grid(args.S, args.P, args.R, args.T, dilemma_only=not args.all)
+        res = payoff_noise_sweep(grid, args.noise, nb_of_games=args.rounds, exact=not args.simulate, seed=args.seed)
+        if args.output:
+            np.savez(args.output, **res)
+        for row in ranking_table(res):
+            print("S=%g P=%g R=%g T=%g noise=%g: %s" % (row[:5] + (", ".join(row[5][:args.top]),)))
+        return
+    if args.kind == "population":
+        from .zd import source_sweep
+        players = _players(args)
+        res = source_sweep(players, nb_of_games=args.rounds)
+        if args.output:
+            np.savez(args.output, **res)
+        valid = ~np.isnan(res["mean"])
+        print("%d strategies, %d valid" % (len(valid), valid.sum()))
+        if valid.any():
+            best = int(np.argmax(np.where(valid, res["mean"], -np.inf)))
+            print("best mean score %.4f: %s" % (res["mean"][best], strategy_names(players)[best]))
+        return
+    if args.kind == "control":
+        res = zd_control_sweep(np.linspace(*args.p1), np.linspace(*args.p4), nb_of_games=args.rounds)
+    else:
+        res = zd_extortion_sweep(np.linspace(*args.chi), nb_of_games=args.rounds)
+    if args.output:
+        np.savez(args.output, **res)
+    valid = res["valid"]
+    print("%d candidates, %d valid" % (valid.size, valid.sum()))
+    if valid.any():
+        means = np.full(valid.shape, -np.inf)
+        means[valid] = np.mean(res["scores"][valid][..., 0], axis=-1)
+        best = np.unravel_index(np.argmax(means), means.shape)
+        params = {key: float(res[key][best]) if np.ndim(res[key]) else float(res[key])
+                  for key in ("p1", "p4", "chi") if key in res}
+        print("best mean score %.4f at %s" % (means[best], params))
+
+def cmd_export(args):
+    from .export import create_sheets, export_tournament
+    players = _players(args)
+    instrument = _instrument(args)
+    if args.sheets:
+        create_sheets(players, players, args.rounds, instrument=instrument)
+    else:
+        written = export_tournament(players, args.rounds, path=args.path, xlsx=not args.no_xlsx,
+                                    csv_file=not args.no_csv, npz=not args.no_npz, instrument=instrument)
+        for path in written:
+            print(path)
+    _finish(args, instrument)
+
+def cmd_serve(args):
+    from .server import serve
+    where = args.socket or "127.0.0.1:%d" % args.port
+    serve(path=args.socket, port=args.port, workers=args.workers, seed=args.seed, cache=args.cache,
+          ready=lambda: print("ipd job server on %s" % where, file=sys.stderr, flush=True))
+
+def cmd_query(args):
+    from .server import submit
+    for message in submit(json.loads(args.job), path=args.socket, port=args.port):
+        if message["type"] != "partial" or args.partial:
+            print(json.dumps(message))
+
+# ================== Parser ================== #
+
+def _strategy_options(parser):
+    parser.add_argument("strategies", nargs="*", type=find_strategy, help="players (default: liste_strat)")
+    parser.add_argument("--random", type=int, default=None, metavar="N",
+                        help="N random memory-one strategies instead (drawn with --seed)")
+    parser.add_argument("--file", default=None, metavar="PATH",
+                        help="strategies of a .csv, .jsonl, .json or .npy file instead (see sources.py)")
+    parser.add_argument("--seed", type=int, default=None)
+
+def _instrument_options(parser):
+    parser.add_argument("--progress", action="store_true", help="live progress on stderr")
+    parser.add_argument("--summary", default=None, metavar="PATH", help="write a JSON summary of the run")
+    parser.add_argument("--profile", default=None, metavar="STAGE", help="cProfile one stage")
+
+def parser():
+    res = argparse.ArgumentParser(prog="ipd", description="Iterated prisoner's dilemma")
+    sub = res.add_subparsers(dest="command", required=True)
+
+    match = sub.add_parser("match", help="one iterated game between two strategies")
+    match.add_argument("strat_a", type=find_strategy)
+    match.add_argument("strat_b", type=find_strategy)
+    match.add_argument("--rounds", type=int, default=10000)
+    match.add_argument("--exact", action="store_true", help="expected scores (Markov chain)")
+    match.add_argument("--distribution", action="store_true",
+                       help="exact score distribution: mean, variance, win probability")
+    match.add_argument("--seed", type=int, default=None)
+    match.add_argument("--cache", default=None, metavar="PATH", help="sqlite result cache (needs --seed)")
+    match.add_argument("--plot", action="store_true", help="plot the running means (matplotlib)")
+    match.add_argument("--backend", choices=["python", "kernel"], default="python",
+                       help="kernel: compiled match loop (Numba if installed)")
+    match.add_argument("--json", action="store_true")
+    match.set_defaults(func=cmd_match)
+
+    tournament = sub.add_parser("tournament", help="round robin tournament")
+    _strategy_options(tournament)
+    tournament.add_argument("--rounds", type=int, default=1000)
+    tournament.add_argument("--exact", action="store_true", help="expected scores (Markov chain)")
+    tournament.add_argument("--workers", type=int, default=None, help="worker processes")
+    tournament.add_argument("--cache", default=None, metavar="PATH", help="sqlite result cache (needs --seed)")
+    tournament.add_argument("--memmap", default=None, metavar="PATH",
+                            help="scores in PATH.npy, tile by tile, resumable (checkpoint PATH.json)")
+    tournament.add_argument("--tile-size", type=int, default=1024)
+    tournament.add_argument("--top", type=int, default=20, help="with --memmap: strategies printed")
+    tournament.add_argument("--approx", type=int, default=None, metavar="K",
+                            help="approximate top K from sampled opponents, with confidence intervals")
+    tournament.add_argument("--json", action="store_true")
+    _instrument_options(tournament)
+    tournament.set_defaults(func=cmd_tournament)
+
+    sweep = sub.add_parser("sweep", help="Zero Determinant parameter sweep")
+    sweep.add_argument("kind", choices=["control", "extortion", "population", "payoffs"],
+                       help="population: the strategies of --file or --random against liste_strat; "
+                            "payoffs: liste_strat tournaments over a grid of --S --P --R --T and --noise")
+    sweep.add_argument("--file", default=None, metavar="PATH")
+    sweep.add_argument("--random", type=int, default=None, metavar="N")
+    sweep.add_argument("--seed", type=int, default=None)
+    sweep.add_argument("--p1", type=float, nargs=3, default=[0.5, 1, 51], metavar=("START", "STOP", "NUM"))
+    sweep.add_argument("--p4", type=float, nargs=3, default=[0, 0.5, 51], metavar=("START", "STOP", "NUM"))
+    sweep.add_argument("--chi", type=float, nargs=3, default=[1, 5, 41], metavar=("START", "STOP", "NUM"))
+    for (name, default) in zip("SPRT", (0, 1, 3, 5)):
+        sweep.add_argument("--" + name, type=float, nargs="+", default=[default], metavar="VALUE")
+    sweep.add_argument("--noise", type=float, nargs="+", default=[0], metavar="E",
+                       help="probabilities to play the opposite move")
+    sweep.add_argument("--all", action="store_true", help="keep payoffs that are not prisoner's dilemmas")
+    sweep.add_argument("--simulate", action="store_true", help="simulated matches instead of exact scores")
+    sweep.add_argument("--top", type=int, default=3, help="strategies printed per grid point")
+    sweep.add_argument("--rounds", type=int, default=10000)
+    sweep.add_argument("--output", default=None, metavar="PATH", help="save the sweep (.npz)")
+    sweep.set_defaults(func=cmd_sweep)
+
+    export = sub.add_parser("export", help="tournament exported to xlsx / csv / npz")
+    _strategy_options(export)
+    export.add_argument("--rounds", type=int, default=10000)
+    export.add_argument("--path", default="tournament")
+    export.add_argument("--sheets", action="store_true", help="one workbook per strategy (create_sheets)")
+    export.add_argument("--no-xlsx", action="store_true")
+    export.add_argument("--no-csv", action="store_true")
+    export.add_argument("--no-npz", action="store_true")
+    _instrument_options(export)
+    export.set_defaults(func=cmd_export)
+
+    serve = sub.add_parser("serve", help="local job server (JSON lines, see server.py)")
+    serve.add_argument("--socket", default=None, metavar="PATH", help="Unix socket (default: localhost TCP)")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--workers", type=int, default=None, help="worker processes")
+    serve.add_argument("--seed", type=int, default=0, help="seed of the jobs that do not give one")
+    serve.add_argument("--cache", default=None, metavar="PATH", help="sqlite result cache kept between runs")
+    serve.set_defaults(func=cmd_serve)
+
+    query = sub.add_parser("query", help="send one JSON job to a job server")
+    query.add_argument("job", help='e.g. \'{"job": "match", "a": "tit_for_tat", "b": "strat_extorque"}\'')
+    query.add_argument("--socket", default=None, metavar="PATH")
+    query.add_argument("--port", type=int, default=8765)
+    query.add_argument("--partial", action="store_true", help="print the partial results too")
+    query.set_defaults(func=cmd_query)
+    return res
+
+def main(argv=None):
+    cli = parser()
+    args = cli.parse_args(argv)
+    if args.command == "sweep" and args.kind == "population" and not (args.file or args.random):
+        cli.error("sweep population needs --file or --random")
+    for key in ("p1", "p4", "chi"):
+        if getattr(args, key, None) is not None:
+            (start, stop, num) = getattr(args, key)
+            setattr(args, key, (start, stop, int(num)))
+    args.func(args)
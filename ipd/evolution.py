@@ -0,0 +1,93 @@
+# ========================================================= #
+# ======================= Evolution ======================= #
+# ========================================================= #
+
+import csv
+
+import numpy as np
+
+# Populations of strategies, driven by the pairwise payoff matrix
+# payoffs[i][j] = score of strategy i against strategy j, e.g.
+# round_robin(liste_strat, None, exact=True)[0] for the long-run scores.
+# Only the share (or count) of each strategy is tracked, so the cost of a
+# generation does not depend on the size of the population.
+# stream: optional path (or open text file) receiving one CSV line of
+# shares per generation.
+
+def _open_stream(stream, names):
+    own = isinstance(stream, str)
+    f = open(stream, "w", newline="") if own else stream
+    writer = None
+    if f is not None:
+        writer = csv.writer(f)
+        writer.writerow(["generation"] + list(names))
+    return f, own, writer
+
+def _close_stream(f, own):
+    if own:
+        f.close()
+    elif f is not None:
+        f.flush()
+
+# ================== Replicator dynamics ================== #
+
+def replicator_dynamics(payoffs, shares, generations, dt=0.1, stream=None, names=None):
+    # dx_i/dt = x_i (f_i - mean f), with f = payoffs @ x (Euler steps of dt)
+    A = np.asarray(payoffs, dtype=float)
+    x = np.asarray(shares, dtype=float)
+    x = x/x.sum()
+    if names is None:
+        names = [str(i) for i in range(len(x))]
+    f, own, writer = _open_stream(stream, names)
+    if writer:
+        writer.writerow([0] + list(x))
+    for g in range(1, generations+1):
+        fitness = A @ x
+        x = x + dt*x*(fitness - x @ fitness)
+        np.clip(x, 0, None, out=x)
+        x = x/x.sum()
+        if writer:
+            writer.writerow([g] + list(x))
+    _close_stream(f, own)
+    return x
+
+# ================== Moran process ================== #
+# Stochastic birth-death process in a population of N agents: an agent is
+# chosen to reproduce with probability proportional to its fitness
+# 1 - intensity + intensity*payoff (payoff against the rest of the
+# population), and its offspring replaces an agent chosen uniformly.
+# A generation is N such events, simulated in steps_per_generation steps
+# of N/steps_per_generation simultaneous events (births drawn with a
+# multinomial, deaths with a multivariate hypergeometric).
+
+def moran_process(payoffs, counts, generations, intensity=1.0, mutation=0.0, steps_per_generation=10,
+                  rng=None, stream=None, names=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    A = np.asarray(payoffs, dtype=float)
+    counts = np.array(counts, dtype=np.int64)
+    N = int(counts.sum())
+    k = len(counts)
+    if names is None:
+        names = [str(i) for i in range(k)]
+    events = max(1, N // steps_per_generation)
+    f, own, writer = _open_stream(stream, names)
+    if writer:
+        writer.writerow([0] + list(counts/N))
+    for g in range(1, generations+1):
+        for _ in range(steps_per_generation):
+            # mean payoff of an agent of each strategy, self excluded
+            payoff = (A @ counts - np.diag(A)) / max(N - 1, 1)
+            fitness = np.maximum(1 - intensity + intensity*payoff, 0)*counts
+            if fitness.sum() == 0:
+                fitness = counts.astype(float)
+            p = fitness/fitness.sum()
+            if mutation:
+                p = (1 - mutation)*p + mutation/k
+            births = rng.multinomial(events, p)
+            deaths = rng.multivariate_hypergeometric(counts, events)
+            counts = counts - deaths + births
+        if writer:
+            writer.writerow([g] + list(counts/N))
+    _close_stream(f, own)
+    return counts
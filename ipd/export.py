@@ -0,0 +1,160 @@
+# ========================================================= #
+# ======================== Export ========================= #
+# ========================================================= #
+
+import csv
+
+import numpy as np
+
+from .instrument import NO_INSTRUMENT
+from .strategies import Strategy, resolve_strategies, strategy_names
+from .tournament import round_robin
+
+# ================== Affichage sous forme d'histogramme ================== #
+# !!! xlsxwriter required !!! (imported only when a workbook is written)
+# Get it here : https://github.com/jmcnamara/XlsxWriter
+# Or just `pip install xlsxwriter`
+    
+def _results_chart(workbook, sheet, name, nb_opponents, nb_of_rounds):
+    # Column chart of the 'Score' and 'Opp score' columns of a results sheet
+    ref = "='" + sheet.replace("'", "''") + "'!"
+    last = str(nb_opponents+3)
+    chart1 = workbook.add_chart({'type': 'column'})
+    
+    chart1.add_series({
+        'name':       ref+'$B$3',
+        'categories': ref+'$A$4:$A$'+last,
+        'values':     ref+'$B$4:$B$'+last,
+    })
+    
+    chart1.add_series({
+        'name':       ref+'$C$3',
+        'categories': ref+'$A$4:$A$'+last,
+        'values':     ref+'$C$4:$C$'+last,
+    })
+    
+    chart1.set_title({'name': 'Results of strategy '+name+" for "+str(nb_of_rounds)+" rounds"})
+    chart1.set_y_axis({'name': 'Mean score'})
+    chart1.set_table({'show_keys': True})
+    chart1.set_legend({'position': 'none'})
+    return chart1
+
+def create_sheets(list_strategies, list_opponents, nb_of_rounds, instrument=None):
+    import xlsxwriter
+    if instrument is None:
+        instrument = NO_INSTRUMENT
+
+    list_strategies = resolve_strategies(list_strategies)
+    list_opponents = resolve_strategies(list_opponents)
+    nb_opponents = len(list_opponents)
+    liste_noms_adv = strategy_names(list_opponents)
+
+    # One tournament for everybody, each sheet reads its row of the matrix
+    def same(x, y):
+        return x is y or (isinstance(x, Strategy) and x == y)
+    players = list(list_strategies)
+    for adv in list_opponents:
+        if not any(same(adv, strat) for strat in players):
+            players.append(adv)
+    cols = [next(i for i, strat in enumerate(players) if same(strat, adv)) for adv in list_opponents]
+    with instrument.stage("simulation"):
+        scores, _ = round_robin(players, nb_of_rounds, instrument=instrument)
+
+    with instrument.stage("export"):
+        for k, name in enumerate(strategy_names(list_strategies)):
+            # Get the results
+            tab = [scores[k, cols], scores[cols, k]]
+        
+            # Export data
+            workbook = xlsxwriter.Workbook("strat_"+name+".xlsx")
+            worksheet = workbook.add_worksheet()
+            bold = workbook.add_format({'bold': 1})
+        
+            headings = ['name adv', 'Score', 'Opp score']
+            worksheet.write_row('A1', ["Made by E. Quimerc'h"], bold)
+            worksheet.write_row('A3', headings, bold)
+            worksheet.write_column('A4', liste_noms_adv)
+            worksheet.write_column('B4', tab[0])
+            worksheet.write_column('C4', tab[1])
+        
+            # Créer le graphique
+            chart1 = _results_chart(workbook, 'Sheet1', name, nb_opponents, nb_of_rounds)
+            worksheet.insert_chart('D18', chart1, {'x_offset': 15, 'y_offset': 5})
+            workbook.close()
+            print("Strategy "+name+": printing")
+            instrument.progress("sheets", k+1, len(list_strategies))
+    print("\Everything printed\n\n\n")
+    return
+
+# ================== Export of a whole tournament ================== #
+# One pass over the score matrix of round_robin:
+#  - path.xlsx: one workbook (constant_memory mode, rows are written in
+#    order and flushed), a "Summary" sheet with the matrix, then one sheet
+#    and chart per strategy, laid out like create_sheets
+#  - path.csv: one line per (strategy, opponent) match
+#  - path.npz: names, scores matrix and number of rounds, for numpy
+
+def _sheet_names(names):
+    # Excel sheet names: at most 31 characters, no []:*?/\, all different
+    used = {"summary"}
+    res = []
+    for name in names:
+        base = "".join("_" if c in "[]:*?/\\" else c for c in name).strip("'")[:31] or "Sheet"
+        sheet, k = base, 1
+        while sheet.lower() in used:
+            k += 1
+            sheet = base[:31 - len(str(k)) - 1] + "~" + str(k)
+        used.add(sheet.lower())
+        res.append(sheet)
+    return res
+
+def export_tournament(strategies, nb_of_rounds, scores=None, path="tournament", xlsx=True, csv_file=True, npz=True,
+                      instrument=None):
+    # scores[i][j]: score of strategies[i] against strategies[j] (see
+    # round_robin), computed if not given. Returns the written paths.
+    if instrument is None:
+        instrument = NO_INSTRUMENT
+    if scores is None:
+        with instrument.stage("simulation"):
+            scores, _ = round_robin(strategies, nb_of_rounds, instrument=instrument)
+    names = strategy_names(strategies)
+    n = len(names)
+    means = np.mean(scores, axis=1)
+    written = []
+
+    with instrument.stage("export"):
+        if xlsx:
+            import xlsxwriter
+            workbook = xlsxwriter.Workbook(path+".xlsx", {'constant_memory': True})
+            bold = workbook.add_format({'bold': 1})
+            summary = workbook.add_worksheet("Summary")
+            summary.write_row(0, 0, ["Made by E. Quimerc'h"], bold)
+            summary.write_row(1, 0, ["Row against column, "+str(nb_of_rounds)+" rounds"])
+            summary.write_row(2, 0, ['name'] + names + ['Mean'], bold)
+            for i in range(n):
+                summary.write(3+i, 0, names[i], bold)
+                summary.write_row(3+i, 1, list(scores[i]) + [means[i]])
+            for (i, sheet) in enumerate(_sheet_names(names)):
+                worksheet = workbook.add_worksheet(sheet)
+                worksheet.write_row(0, 0, ["Made by E. Quimerc'h"], bold)
+                worksheet.write_row(2, 0, ['name adv', 'Score', 'Opp score'], bold)
+                for j in range(n):
+                    worksheet.write_row(3+j, 0, [names[j], scores[i][j], scores[j][i]])
+                chart1 = _results_chart(workbook, sheet, names[i], n, nb_of_rounds)
+                worksheet.insert_chart('D18', chart1, {'x_offset': 15, 'y_offset': 5})
+                instrument.progress("sheets", i+1, n)
+            workbook.close()
+            written.append(path+".xlsx")
+
+        if csv_file:
+            with open(path+".csv", "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["strategy", "opponent", "score", "opp_score"])
+                for i in range(n):
+                    writer.writerows([names[i], names[j], repr(float(scores[i][j])), repr(float(scores[j][i]))] for j in range(n))
+            written.append(path+".csv")
+
+        if npz:
+            np.savez(path+".npz", names=np.array(names), scores=scores, nb_of_rounds=nb_of_rounds)
+            written.append(path+".npz")
+    return written
@@ -0,0 +1,157 @@
+# ========================================================= #
+# ====================== Simulation ======================= #
+# ========================================================= #
+
+import random
+import time
+
+import numpy as np
+
+from .model import utility_matrix
+from .strategies import (liste_strat, _field, _padding_state, memory_tables, resolve_strategy,
+                         strategy_key, strategy_names)
+from .instrument import NO_INSTRUMENT
+from .trajectory import TrajectoryRecorder
+from .markov import markov_game
+from .kernel import kernel_states
+
+def match_seed(seed, key_a, key_b):
+    # SeedSequence of the match key_a vs key_b (keys from strategy_key)
+    entropy = np.random.SeedSequence(seed).entropy
+    return np.random.SeedSequence(entropy, spawn_key=(int(key_a, 16), int(key_b, 16)))
+
+# ========= Iterated game for 2 strategies ========= #
+
+def iterated_game(nb_of_games, strat_a, strat_b, display=False, utility_matrix=utility_matrix, rng=None,
+                  seed=None, cache=None, trajectory=None, backend="python"):
+    # rng: optional random.Random or numpy Generator, instead of the global
+    # state of the random module (to reproduce a match)
+    # seed: master seed of the match stream (see match_seed), required to
+    # use a ResultCache
+    # trajectory: TrajectoryRecorder of the running means (display=True
+    # creates one if needed and plots it)
+    # backend: "python" plays the rounds here, "kernel" in the match kernel
+    # (compiled with Numba if installed, see kernel.py). The two do not
+    # use the random numbers the same way: same statistics, other draws.
+    if backend not in ("python", "kernel"):
+        raise ValueError("backend must be 'python' or 'kernel'")
+    strat_a, strat_b = resolve_strategy(strat_a), resolve_strategy(strat_b)
+    if display and trajectory is None:
+        trajectory = TrajectoryRecorder(nb_of_games)
+    if trajectory is not None:
+        cache = None
+        backend = "python"
+    if seed is not None:
+        key_a, key_b = strategy_key(strat_a), strategy_key(strat_b)
+        if cache is not None:
+            engine = "iterated_game" if backend == "python" else "match_kernel"
+            key = cache.key(key_a, key_b, nb_of_games, seed, utility_matrix, engine)
+            hit = cache.get(key)
+            if hit is not None:
+                return hit
+        if rng is None and backend == "python":
+            rng = random.Random(match_seed(seed, key_a, key_b).generate_state(4).tobytes())
+        elif rng is None:
+            rng = np.random.default_rng(match_seed(seed, key_a, key_b))
+    if backend == "kernel":
+        res = _kernel_game(nb_of_games, strat_a, strat_b, utility_matrix, rng)
+        if seed is not None and cache is not None:
+            cache.put(key, res)
+        return res
+    rand = random.random if rng is None else rng.random
+    # plain lists: no dict or ndarray lookup inside the loop. Both tables are
+    # indexed by the history state of A (see memory_tables)
+    (table_a, table_b, memory) = memory_tables(strat_a, strat_b)
+    (table_a, table_b) = (table_a.tolist(), table_b.tolist())
+    mask = 4**memory - 1
+    utility = np.asarray(utility_matrix).tolist()
+    
+    if rand() < _field(strat_a, "first", "premier"):
+        a = 0
+    else:
+        a = 1
+    if rand() < _field(strat_b, "first", "premier"):
+        b = 0
+    else:
+        b = 1
+    
+    state = ((_padding_state(memory) << 2) | (2*a + b)) & mask
+    gain_a = utility[a][b][0]
+    gain_b = utility[a][b][1]
+
+    if trajectory is not None:
+        trajectory.record(1, gain_a, gain_b)
+        
+    for i in range(1, nb_of_games):
+        
+        if rand() < table_a[state]: 
+            new_choice_of_A = 0
+        else:
+            new_choice_of_A = 1
+            
+        if rand() < table_b[state]:
+            new_choice_of_B = 0
+        else:
+            new_choice_of_B = 1
+        
+        (a, b) = (new_choice_of_A, new_choice_of_B)
+        state = ((state << 2) | (2*a + b)) & mask
+        
+        gain_a += utility[a][b][0]
+        gain_b += utility[a][b][1]
+        
+        if trajectory is not None:
+            trajectory.record(i+1, gain_a, gain_b)
+        
+    if trajectory is not None:
+        trajectory.close()
+    if display:
+        trajectory.plot(_field(strat_a, "name", "nom"), _field(strat_b, "name", "nom"))
+    mean_score_a = int(100*gain_a/nb_of_games)/100
+    mean_score_b = int(100*gain_b/nb_of_games)/100
+    if seed is not None and cache is not None:
+        cache.put(key, (mean_score_a, mean_score_b))
+    return (mean_score_a, mean_score_b)
+
+def _kernel_game(nb_of_games, strat_a, strat_b, utility_matrix, rng):
+    # rng: numpy Generator, random.Random (seeds a Generator) or None
+    if rng is None:
+        rng = np.random.default_rng()
+    elif not isinstance(rng, np.random.Generator):
+        rng = np.random.default_rng(rng.getrandbits(128))
+    (table_a, table_b, memory) = memory_tables(strat_a, strat_b)
+    counts = kernel_states(nb_of_games, table_a, table_b, memory, _field(strat_a, "first", "premier"),
+                           _field(strat_b, "first", "premier"), _padding_state(memory), rng)
+    gains = counts @ np.reshape(utility_matrix, (4, 2))
+    mean_score_a = int(100*gains[0]/nb_of_games)/100
+    mean_score_b = int(100*gains[1]/nb_of_games)/100
+    return (mean_score_a, mean_score_b)
+
+# ================== For a Strategy ================== #
+
+def results_strategies(strat, nb_of_games, opponents = liste_strat, exact=False, seed=None, cache=None,
+                       instrument=None):
+    # exact=True computes the expected scores with markov_game instead of
+    # simulating (nb_of_games=None then gives the long-run scores)
+    # seed, cache: see iterated_game
+    if instrument is None:
+        instrument = NO_INSTRUMENT
+    
+    n = len(opponents)
+    M = np.zeros((n,2)) 
+
+    for i in range(n): 
+        start = time.perf_counter()
+        with instrument.stage("match"):
+            if exact:
+                M[i] = markov_game(strat, opponents[i], nb_of_games)
+            else:
+                M[i] = iterated_game(nb_of_games, strat, opponents[i], seed=seed, cache=cache)
+                instrument.count("rounds", nb_of_games)
+        instrument.count("matches")
+        if instrument.enabled:
+            names = strategy_names([strat, opponents[i]])
+            instrument.item("match", names[0]+" vs "+names[1], time.perf_counter() - start)
+        instrument.progress("matches", i+1, n)
+
+    return M
@@ -0,0 +1,116 @@
+# ========================================================= #
+# ==================== Instrumentation ==================== #
+# ========================================================= #
+
+import cProfile
+import io
+import json
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+
+# Optional measurements of the long runs, passed as `instrument=` to the
+# match, tournament and export functions. Everything is recorded per
+# stage or per chunk of work, never per round:
+#  - stage(name): wall time and number of calls of each stage
+#    ("match", "tournament", "simulation", "export"...), with an optional
+#    cProfile capture of one chosen stage (profile="export")
+#  - count(name, n): counters (matches, rounds, cache hits...)
+#  - item(stage, label, seconds): the slowest pairings of a stage
+#  - progress(name, done, total): live progress, rate and ETA on stderr
+#  - summary() / write_summary(path): machine-readable report of the run
+
+class Instrumentation:
+
+    def __init__(self, progress=False, profile=None, stream=None, interval=1.0, slowest=10, enabled=True):
+        self.enabled = enabled
+        self.show_progress = progress
+        self.profile_stage = profile
+        self.stream = stream
+        self.interval = interval
+        self.slowest = slowest
+        self.timers = {}
+        self.counters = {}
+        self.items = {}
+        self.profiles = {}
+        self._progress = {}
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        profiler = None
+        if name == self.profile_stage:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                if name in self.profiles:
+                    self.profiles[name].add(profiler)
+                else:
+                    self.profiles[name] = pstats.Stats(profiler)
+            timer = self.timers.setdefault(name, [0.0, 0])
+            timer[0] += elapsed
+            timer[1] += 1
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def item(self, stage, label, seconds):
+        if self.enabled:
+            items = self.items.setdefault(stage, [])
+            items.append((seconds, label))
+            if len(items) > 4*self.slowest:
+                items.sort(reverse=True)
+                del items[self.slowest:]
+
+    def progress(self, name, done, total):
+        if not (self.enabled and self.show_progress):
+            return
+        now = time.perf_counter()
+        (start, last) = self._progress.get(name, (now, None))
+        if last is not None and now - last < self.interval and done < total:
+            return
+        self._progress[name] = (start, now)
+        elapsed = now - start
+        rate = done/elapsed if elapsed > 0 else 0
+        eta = (total - done)/rate if rate > 0 else float("nan")
+        stream = self.stream or sys.stderr
+        stream.write("\r%s: %d/%d (%.0f%%) %.3g/s, ETA %.1fs " % (name, done, total, 100*done/max(total, 1), rate, eta))
+        if done >= total:
+            stream.write("\n")
+            del self._progress[name]
+        stream.flush()
+
+    def profile_report(self, stage=None, limit=20, sort="cumulative"):
+        stats = self.profiles[stage or self.profile_stage]
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def summary(self):
+        simulation = sum(self.timers.get(name, [0])[0] for name in ("match", "tournament"))
+        res = {"wall_seconds": time.perf_counter() - self.start,
+               "stages": {name: {"seconds": t, "calls": c} for name, (t, c) in self.timers.items()},
+               "counters": dict(self.counters),
+               "slowest": {stage: [{"label": label, "seconds": t} for (t, label) in sorted(items, reverse=True)[:self.slowest]]
+                           for stage, items in self.items.items()}}
+        if self.counters.get("rounds") and simulation > 0:
+            res["rounds_per_second"] = self.counters["rounds"]/simulation
+        return res
+
+    def write_summary(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=1)
+
+NO_INSTRUMENT = Instrumentation(enabled=False)
@@ -0,0 +1,63 @@
+# ========================================================= #
+# ====================== Match kernel ===================== #
+# ========================================================= #
+
+import numpy as np
+
+# The rounds of one match depend on each other and cannot be vectorized.
+# The kernel plays a block of rounds from uniforms drawn in advance by a
+# numpy Generator; it is compiled with Numba when it is installed
+# (`pip install numba`), and run as plain Python over lists otherwise.
+# Both versions read the same draws: same seed, same scores.
+# numba is imported at the first compiled call, not with the package.
+
+def _match_block(draws_a, draws_b, table_a, table_b, mask, state, counts):
+    # Plays len(draws_a) rounds from the history state `state` (see
+    # memory_tables), adds the joint moves to counts, returns the new state
+    for i in range(len(draws_a)):
+        a = 0 if draws_a[i] < table_a[state] else 1
+        b = 0 if draws_b[i] < table_b[state] else 1
+        state = ((state << 2) | (2*a + b)) & mask
+        counts[state & 3] += 1
+    return state
+
+_compiled = []
+
+def compiled_kernel():
+    # The Numba version of _match_block, or None without Numba
+    if not _compiled:
+        try:
+            from numba import njit
+        except ImportError:
+            _compiled.append(None)
+        else:
+            _compiled.append(njit(cache=True, nogil=True)(_match_block))
+    return _compiled[0]
+
+def kernel_states(nb_of_games, table_a, table_b, memory, first_a, first_b, padding, rng, jit=None,
+                  block_size=2**16):
+    # Number of rounds spent in each joint state (4,), like batch_states.
+    # jit: None uses Numba if available, True requires it, False never.
+    kernel = compiled_kernel() if jit is not False else None
+    if jit and kernel is None:
+        raise ImportError("numba is required for jit=True")
+    mask = 4**memory - 1
+    counts = np.zeros(4, dtype=np.int64)
+    (u_a, u_b) = rng.random(2)
+    (a, b) = (int(u_a >= first_a), int(u_b >= first_b))
+    state = ((padding << 2) | (2*a + b)) & mask
+    counts[2*a + b] += 1
+    if kernel is not None:
+        (table_a, table_b) = (np.ascontiguousarray(table_a, dtype=float), np.ascontiguousarray(table_b, dtype=float))
+    else:
+        (table_a, table_b, counts) = (np.asarray(table_a).tolist(), np.asarray(table_b).tolist(), counts.tolist())
+    done = 1
+    while done < nb_of_games:
+        k = min(block_size, nb_of_games - done)
+        draws = rng.random((2, k))
+        if kernel is not None:
+            state = kernel(draws[0], draws[1], table_a, table_b, mask, state, counts)
+        else:
+            state = _match_block(draws[0].tolist(), draws[1].tolist(), table_a, table_b, mask, state, counts)
+        done += k
+    return np.asarray(counts, dtype=np.int64)
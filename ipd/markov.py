@@ -0,0 +1,202 @@
+# ========================================================= #
+# ============== Exact scores (Markov chain) ============== #
+# ========================================================= #
+
+import numpy as np
+
+from .model import utility_matrix
+from .strategies import (_field, _padding_state, memory_of, memory_tables, resolve_strategy,
+                         strategy_arrays)
+
+# Two memory-one strategies make a Markov chain over the 4 joint states.
+# The expected number of rounds spent in each state gives the exact
+# expected scores, without any random draw.
+
+def _joint(pa, pb):
+    # Probabilities of the joint moves (a, b) = (0,0), (0,1), (1,0), (1,1)
+    # when A cooperates with probability pa and B with probability pb
+    return np.stack([pa*pb, pa*(1-pb), (1-pa)*pb, (1-pa)*(1-pb)], axis=-1)
+
+def transition_matrices(strats_a, strats_b):
+    # T[..., s, t]: probability to go from joint state s to joint state t
+    k = np.shape(strats_a)[:-2]
+    pa = np.reshape(strats_a, k + (4,))
+    pb = np.reshape(np.swapaxes(strats_b, -1, -2), k + (4,))
+    return _joint(np.asarray(pa, dtype=float), np.asarray(pb, dtype=float))
+
+def _power_sums(M, n):
+    # I + M + ... + M^(n-1), by binary splitting (O(log n) products)
+    eye = np.broadcast_to(np.eye(M.shape[-1]), M.shape)
+    S, P = np.zeros(M.shape), eye.copy()  # sum of the first acc powers, M^acc
+    Sb, Pb = eye.copy(), M.copy()         # same for a block of 2^j powers
+    while n:
+        if n & 1:
+            S = S + P @ Sb
+            P = P @ Pb
+        n >>= 1
+        if n:
+            Sb = Sb + Pb @ Sb
+            Pb = Pb @ Pb
+    return S
+
+def limit_matrix(M):
+    # Cesaro limit of the powers of M: row s is the long-run distribution
+    # of the states when starting from s. Works for non ergodic chains
+    # (several closed classes, transient states, periodic classes).
+    k = len(M)
+    reach = (np.asarray(M) > 0) | np.eye(k, dtype=bool)
+    for _ in range(max(k - 1, 1).bit_length()):
+        # paths twice as long at each step
+        reach = (reach.astype(float) @ reach.astype(float)) > 0
+    recurrent = [i for i in range(k) if reach[:, i][reach[i]].all()]
+    transient = [i for i in range(k) if i not in recurrent]
+    Pi = np.zeros((k, k))
+    classes = []
+    for i in recurrent:
+        if not any(i in c for c in classes):
+            classes.append([j for j in recurrent if reach[i, j]])
+    for c in classes:
+        # stationary distribution of the closed class: pi (M - I) = 0, sum(pi) = 1
+        A = np.vstack([(M[np.ix_(c, c)] - np.eye(len(c))).T, np.ones(len(c))])
+        rhs = np.zeros(len(c) + 1)
+        rhs[-1] = 1
+        pi = np.linalg.lstsq(A, rhs, rcond=None)[0]
+        Pi[np.ix_(c, c)] = pi
+        if transient:
+            # probability that each transient state ends up in this class
+            Q = M[np.ix_(transient, transient)]
+            r = M[np.ix_(transient, c)].sum(axis=1)
+            h = np.linalg.solve(np.eye(len(transient)) - Q, r)
+            Pi[np.ix_(transient, c)] = np.outer(h, pi)
+    return Pi
+
+def markov_states(nb_of_games, strats_a, firsts_a, strats_b, firsts_b):
+    # Expected number of rounds spent in each joint state, shape (m, 4),
+    # like batch_states. nb_of_games=None gives the long-run frequencies.
+    M = transition_matrices(strats_a, strats_b)
+    start = _joint(np.asarray(firsts_a, dtype=float), np.asarray(firsts_b, dtype=float))
+    if nb_of_games is None:
+        Pi = np.array([limit_matrix(T) for T in M])
+    else:
+        Pi = _power_sums(M, nb_of_games)
+    return (start[:, None, :] @ Pi)[:, 0, :]
+
+def markov_batch_game(nb_of_games, strats_a, firsts_a, strats_b, firsts_b, utility_matrix=utility_matrix):
+    # Exact (mean_score_a, mean_score_b) for each match, not truncated
+    freq = markov_states(nb_of_games, strats_a, firsts_a, strats_b, firsts_b)
+    if nb_of_games is not None:
+        freq = freq / nb_of_games
+    return freq @ np.reshape(utility_matrix, (4, 2))
+
+def markov_game(strat_a, strat_b, nb_of_games=None, utility_matrix=utility_matrix):
+    # Exact expected mean scores of iterated_game(nb_of_games, strat_a, strat_b),
+    # or the long-run mean scores when nb_of_games is None
+    strat_a, strat_b = resolve_strategy(strat_a), resolve_strategy(strat_b)
+    if memory_of(strat_a) > 1 or memory_of(strat_b) > 1:
+        return memory_markov_game(strat_a, strat_b, nb_of_games, utility_matrix=utility_matrix)
+    strats_a, firsts_a = strategy_arrays([strat_a])
+    strats_b, firsts_b = strategy_arrays([strat_b])
+    res = markov_batch_game(nb_of_games, strats_a, firsts_a, strats_b, firsts_b, utility_matrix=utility_matrix)
+    return (float(res[0][0]), float(res[0][1]))
+
+def memory_markov_game(strat_a, strat_b, nb_of_games=None, utility_matrix=utility_matrix):
+    # markov_game over the 4**memory history states (memory-n strategies)
+    (table_a, table_b, memory) = memory_tables(strat_a, strat_b)
+    T = memory_transition_matrix(table_a, table_b, memory)
+    k = 4**memory
+    start = _start_distribution(strat_a, strat_b, memory)
+    if nb_of_games is None:
+        freq = start @ limit_matrix(T)
+    else:
+        freq = start @ _power_sums(T[None], nb_of_games)[0] / nb_of_games
+    # the score of a state is the one of its last joint move
+    res = freq @ np.reshape(utility_matrix, (4, 2))[np.arange(k) & 3]
+    return (float(res[0]), float(res[1]))
+
+def _start_distribution(strat_a, strat_b, memory):
+    # state after the first round: the padding followed by the first moves
+    k = 4**memory
+    start = np.zeros(k)
+    first = _joint(np.float64(_field(strat_a, "first", "premier")), np.float64(_field(strat_b, "first", "premier")))
+    for j in range(4):
+        start[((_padding_state(memory) << 2) | j) & (k - 1)] += first[j]
+    return start
+
+def memory_transition_matrix(table_a, table_b, memory):
+    # T[s, t] over the 4**memory states of A
+    k = 4**memory
+    T = np.zeros((k, k))
+    states = np.arange(k)
+    joint = _joint(table_a, table_b)
+    for j in range(4):
+        T[states, ((states << 2) | j) & (k - 1)] += joint[:, j]
+    return T
+
+# ================== Exact score distributions ================== #
+# The distribution of a total score over nb_of_games rounds, propagated
+# round by round over (history state, total so far): no sampling, and
+# O(nb_of_games**2 * k**2) operations for k history states (k = 4 for
+# memory-one strategies). The payoffs must be integers so that the totals
+# fall on a grid.
+
+def _sum_distribution(T, start, values, nb_of_games):
+    # Distribution of the sum over the rounds of values[state], returned as
+    # (possible sums, probabilities)
+    low = int(values.min())
+    shift = values - low
+    width = int(shift.max())
+    k = len(start)
+    dist = np.zeros((k, nb_of_games*width + 1))
+    dist[np.arange(k), shift] = start
+    steps = [(u, shift == u) for u in np.unique(shift)]
+    for r in range(1, nb_of_games):
+        used = r*width + 1
+        flow = T.T @ dist[:, :used]
+        dist[:, :used + width] = 0
+        for (u, rows) in steps:
+            dist[rows, u:u + used] = flow[rows]
+    probs = dist.sum(axis=0)
+    sums = np.arange(len(probs)) + nb_of_games*low
+    support = np.nonzero(probs)[0]
+    if len(support):
+        (probs, sums) = (probs[support[0]:support[-1] + 1], sums[support[0]:support[-1] + 1])
+    return sums, probs
+
+def score_distribution(strat_a, strat_b, nb_of_games, utility_matrix=utility_matrix):
+    # Exact distribution of the mean scores iterated_game(nb_of_games,
+    # strat_a, strat_b) would return (before truncation), and of the score
+    # difference A - B. Returns a dict:
+    #  - "score_a", "score_b", "diff": {"values", "probs"}, values being
+    #    mean scores per round and probs their probabilities
+    #  - "mean", "var": (A, B) of the mean scores per round
+    #  - "win", "draw", "loss": probabilities that A ends above, equal to
+    #    or below B
+    utility = np.reshape(np.asarray(utility_matrix, dtype=float), (4, 2))
+    if not np.array_equal(utility, np.round(utility)):
+        raise ValueError("score_distribution needs integer payoffs")
+    if nb_of_games < 1:
+        raise ValueError("nb_of_games must be at least 1")
+    utility = np.round(utility).astype(np.int64)
+    strat_a, strat_b = resolve_strategy(strat_a), resolve_strategy(strat_b)
+    (table_a, table_b, memory) = memory_tables(strat_a, strat_b)
+    T = memory_transition_matrix(table_a, table_b, memory)
+    start = _start_distribution(strat_a, strat_b, memory)
+    # the score of a state is the one of its last joint move
+    last = np.arange(4**memory) & 3
+    res = {"rounds": nb_of_games}
+    for (name, values) in [("score_a", utility[last, 0]), ("score_b", utility[last, 1]),
+                           ("diff", utility[last, 0] - utility[last, 1])]:
+        (sums, probs) = _sum_distribution(T, start, values, nb_of_games)
+        res[name] = {"values": sums / nb_of_games, "probs": probs}
+    means, variances = [], []
+    for name in ("score_a", "score_b"):
+        (values, probs) = (res[name]["values"], res[name]["probs"])
+        mean = float(probs @ values)
+        means.append(mean)
+        variances.append(float(probs @ (values - mean)**2))
+    res["mean"], res["var"] = tuple(means), tuple(variances)
+    (values, probs) = (res["diff"]["values"], res["diff"]["probs"])
+    res["win"] = float(probs[values > 0].sum())
+    res["draw"] = float(probs[values == 0].sum())
+    res["loss"] = float(probs[values < 0].sum())
+    return res
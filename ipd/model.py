@@ -0,0 +1,21 @@
+# ========================================================= #
+# ===================== Modelisation ====================== #
+# ========================================================= #
+
+import numpy as np
+
+def transpose(A):
+    (n, p) = np.shape(A)
+    B = np.zeros((p, n))
+    for i in range(n):
+        for j in range(p):
+            B[j][i] = A[i][j]
+    return B
+
+initial_game = (0, 0)
+
+(S,P,R,T) = (0,1,3,5)
+
+utility_matrix = np.array([[[R, R], [S, T]],
+                          [[T, S], [P, P]]])
+
@@ -0,0 +1,92 @@
+# ========================================================= #
+# ================ Payoff and noise sweep ================= #
+# ========================================================= #
+
+import itertools
+
+import numpy as np
+
+from .strategies import liste_strat, strategy_arrays, strategy_names
+from .batch import batch_states
+from .markov import markov_states
+
+# Whole liste_strat tournaments for a grid of payoffs (S, P, R, T) and of
+# execution noise levels: with probability `noise` the move played is the
+# opposite of the intended one (trembling hand), so a strategy that
+# cooperates with probability p actually cooperates with probability
+# p*(1-noise) + (1-p)*noise. The noise changes the strategies, not the
+# payoffs: the rounds spent in each joint state are computed once per
+# noise level (exactly, or simulated with the same random draws for every
+# level), and every payoff setting is then one matrix product.
+
+def payoff_grid(S_values, P_values, R_values, T_values, dilemma_only=True):
+    # Rows (S, P, R, T) of all the combinations; dilemma_only keeps the
+    # prisoner's dilemmas, T > R > P > S and 2R > T + S
+    grid = np.array(list(itertools.product(S_values, P_values, R_values, T_values)), dtype=float).reshape(-1, 4)
+    if dilemma_only:
+        (S, P, R, T) = grid.T
+        grid = grid[(T > R) & (R > P) & (P > S) & (2*R > T + S)]
+    return grid
+
+def utility_matrices(payoffs):
+    # (g, 4) rows (S, P, R, T) -> (g, 2, 2, 2) arrays like utility_matrix
+    (S, P, R, T) = np.asarray(payoffs, dtype=float).reshape(-1, 4).T
+    return np.stack([np.stack([np.stack([R, R], -1), np.stack([S, T], -1)], -2),
+                     np.stack([np.stack([T, S], -1), np.stack([P, P], -1)], -2)], -3)
+
+def noisy(strats, firsts, noise):
+    # Strategies as played with execution errors of probability noise
+    strats, firsts = np.asarray(strats, dtype=float), np.asarray(firsts, dtype=float)
+    return strats*(1 - noise) + (1 - strats)*noise, firsts*(1 - noise) + (1 - firsts)*noise
+
+def payoff_noise_sweep(payoffs, noises, strategies=liste_strat, nb_of_games=10000, exact=True, seed=None,
+                       block_size=1024):
+    # payoffs: (g, 4) rows (S, P, R, T) (see payoff_grid); noises: (e,).
+    # exact=False simulates the matches (batch_states) with the same draws
+    # for every noise level (common random numbers, seed=None: a fresh
+    # seed), the scores being truncated like batch_game.
+    # Returns {"payoffs" (g, 4), "noise" (e,), "names", "scores" (e, g, n, n)
+    # (scores[k, p] as in round_robin), "means" (e, g, n), "ranking"
+    # (e, g, n) best first, "rank" (e, g, n) of each strategy}
+    payoffs = np.asarray(payoffs, dtype=float).reshape(-1, 4)
+    noises = np.atleast_1d(np.asarray(noises, dtype=float))
+    strats, firsts = strategy_arrays(strategies)
+    n = len(firsts)
+    ia, ib = np.triu_indices(n)
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    U = utility_matrices(payoffs).reshape(-1, 4, 2)
+    scores = np.zeros((len(noises), len(payoffs), n, n))
+    diag = ia == ib
+    for (k, noise) in enumerate(noises):
+        (s, f) = noisy(strats, firsts, noise)
+        if exact:
+            counts = markov_states(nb_of_games, s[ia], f[ia], s[ib], f[ib])
+        else:
+            rng = np.random.default_rng(seed)
+            counts = batch_states(nb_of_games, s[ia], f[ia], s[ib], f[ib], rng=rng, block_size=block_size)
+        # (pairs, 4) @ (g, 4, 2) -> (g, pairs, 2): every payoff setting at once
+        gains = counts @ U
+        if exact:
+            gains = gains / nb_of_games
+        else:
+            gains = np.floor(100*gains/nb_of_games)/100
+        scores[k][:, ia, ib] = gains[..., 0]
+        scores[k][:, ib, ia] = gains[..., 1]
+        # a strategy against itself: both sides are the same player
+        scores[k][:, ia[diag], ia[diag]] = gains[:, diag].mean(axis=-1)
+    means = scores.mean(axis=-1)
+    ranking = np.argsort(-means, axis=-1, kind="stable")
+    rank = np.empty_like(ranking)
+    np.put_along_axis(rank, ranking, np.arange(n), axis=-1)
+    return {"payoffs": payoffs, "noise": noises, "names": strategy_names(strategies), "scores": scores,
+            "means": means, "ranking": ranking, "rank": rank}
+
+def ranking_table(sweep):
+    # One row per grid point: (S, P, R, T, noise, names best first)
+    rows = []
+    for (k, noise) in enumerate(sweep["noise"]):
+        for (p, payoff) in enumerate(sweep["payoffs"]):
+            rows.append(tuple(float(x) for x in payoff) + (float(noise),
+                        [sweep["names"][i] for i in sweep["ranking"][k, p]]))
+    return rows
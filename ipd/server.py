@@ -0,0 +1,458 @@
+# ========================================================= #
+# ====================== Job server ======================= #
+# ========================================================= #
+
+import asyncio
+import json
+import os
+import socket
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from .model import utility_matrix
+from .strategies import liste_strat, strategy_arrays, strategy_key, strategy_names
+from .markov import markov_batch_game
+from .tournament import _play_matches, _fill_scores, ranking
+from .game import match_seed
+from .cache import ResultCache
+
+# A long-running local service: python3 -m ipd serve --socket ipd.sock
+# (or --port 8765 for localhost TCP). Clients send one JSON job per line
+# and get JSON lines back, tagged with the "id" of the job:
+#   {"id": 1, "job": "match", "a": "tit_for_tat", "b": "strat_extorque", "rounds": 10000}
+#   {"id": 2, "job": "tournament", "strategies": [...] or {"random": N, "seed": s}, "rounds": 1000}
+#   {"id": 3, "job": "sweep", "kind": "payoffs" | "control" | "extortion", ...}
+#   {"id": 4, "job": "stats"}
+# Options of match and tournament: "exact", "seed" (the server seed by
+# default), "payoffs" [S, P, R, T]. Strategies are names, variable names
+# or ids (as on the command line) or {"strat", "first", "name"} objects.
+# A tournament streams {"type": "partial", "pairs", "scores"} messages as
+# its matches finish, then every job ends with {"type": "done", "result"}
+# or {"type": "error", "error"}.
+#
+# The matches run on a pool of worker processes started (and warmed up)
+# with the server. Every pairing has its own seeded stream (match_seed, as
+# in parallel_round_robin), so a pairing already computed, or being
+# computed for another job, is never played twice: its result comes from
+# memory (or from the sqlite ResultCache), or from the shared future of
+# the running computation.
+
+def _exact_matches(args):
+    # Runs in a worker process
+    (nb_of_games, strats_a, firsts_a, strats_b, firsts_b, utility_matrix) = args
+    return markov_batch_game(nb_of_games, strats_a, firsts_a, strats_b, firsts_b, utility_matrix=utility_matrix)
+
+def _seeded_matches(args):
+    # Runs in a worker process: the streams of the pairings (match_seed)
+    # are derived here rather than on the event loop
+    (nb_of_games, strats_a, firsts_a, strats_b, firsts_b, keys_a, keys_b, seed, utility_matrix) = args
+    seeds = [match_seed(seed, key_a, key_b) for (key_a, key_b) in zip(keys_a, keys_b)]
+    return _play_matches((nb_of_games, strats_a, firsts_a, strats_b, firsts_b, seeds, utility_matrix))
+
+def _pair_keys(strats, firsts, ia, ib, nb_of_games, seed, utility_matrix, engine):
+    # Runs in a thread: strategy_key once per strategy, then the
+    # ResultCache key of every pairing ia[p] vs ib[p]
+    strategy_keys = [strategy_key(strats[k], firsts[k]) for k in range(len(firsts))]
+    keys_a, keys_b = [strategy_keys[i] for i in ia], [strategy_keys[j] for j in ib]
+    keys = [ResultCache.key(key_a, key_b, nb_of_games, seed, utility_matrix, engine)
+            for (key_a, key_b) in zip(keys_a, keys_b)]
+    return keys_a, keys_b, keys
+
+def _encode(message):
+    # JSON line of a message (numpy arrays as lists)
+    return (json.dumps(message, default=lambda x: x.tolist()) + "\n").encode()
+
+def _write(db, chunks):
+    # In the cache thread: results of chunks of pairings -> sqlite
+    db.put_many([(key, (float(r[0]), float(r[1]))) for (keys, res) in chunks for (key, r) in zip(keys, res)])
+
+def _settle(placeholder, future):
+    # Result of a chunk played by the pool -> the placeholder future that
+    # the jobs are waiting for
+    if placeholder.done():
+        return
+    if future.cancelled():
+        placeholder.cancel()
+    elif future.exception() is not None:
+        placeholder.set_exception(future.exception())
+    else:
+        placeholder.set_result(future.result())
+
+def _warm_up():
+    return os.getpid()
+
+def _nan_to_none(values):
+    return [None if np.isnan(x) else float(x) for x in np.ravel(values)]
+
+def _sweep(job):
+    # Runs in a worker process
+    rounds = job.get("rounds", 10000)
+    if job["kind"] == "payoffs":
+        from .payoffs import payoff_grid, payoff_noise_sweep, ranking_table
+        grid = payoff_grid(job.get("S", [0]), job.get("P", [1]), job.get("R", [3]), job.get("T", [5]),
+                           dilemma_only=job.get("dilemma_only", True))
+        res = payoff_noise_sweep(grid, job.get("noise", [0]), strategies=parse_strategies(job.get("strategies")),
+                                 nb_of_games=rounds, exact=job.get("exact", True), seed=job.get("seed"))
+        return {"names": res["names"], "table": ranking_table(res), "means": res["means"].tolist()}
+    from .zd import zd_control_sweep, zd_extortion_sweep
+    if job["kind"] == "control":
+        res = zd_control_sweep(np.linspace(*job.get("p1", [0.5, 1, 51])), np.linspace(*job.get("p4", [0, 0.5, 51])),
+                               nb_of_games=rounds)
+        params = {"p1": _nan_to_none(res["p1"]), "p4": _nan_to_none(res["p4"]), "gain": _nan_to_none(res["gain"])}
+    elif job["kind"] == "extortion":
+        res = zd_extortion_sweep(np.linspace(*job.get("chi", [1, 5, 41])), nb_of_games=rounds)
+        params = {"chi": _nan_to_none(res["chi"])}
+    else:
+        raise ValueError("unknown sweep kind: %r" % job["kind"])
+    means = np.full(res["valid"].shape, np.nan)
+    means[res["valid"]] = res["scores"][res["valid"]][..., 0].mean(axis=-1)
+    return dict(params, valid=res["valid"].ravel().tolist(), mean=_nan_to_none(means))
+
+def _strategy(spec):
+    if isinstance(spec, dict):
+        return {"strat": np.asarray(spec["strat"], dtype=float), "first": spec.get("first", 1),
+                "name": spec.get("name", "Strategy")}
+    from .cli import find_strategy
+    try:
+        return find_strategy(str(spec))
+    except Exception as error:
+        raise ValueError(str(error))
+
+def parse_strategies(spec):
+    # Strategies of a job: a list, {"random": N, "seed": s}, or None (liste_strat)
+    if spec is None:
+        return liste_strat
+    if isinstance(spec, dict):
+        from .sources import RandomStrategies
+        return RandomStrategies(spec["random"], seed=spec.get("seed"))
+    return [_strategy(s) for s in spec]
+
+def _utility(job):
+    if "payoffs" in job:
+        from .payoffs import utility_matrices
+        return utility_matrices([job["payoffs"]])[0]
+    return utility_matrix
+
+class JobServer:
+
+    line_limit = 2**26  # longest job line accepted (a list of strategies can be long)
+
+    def __init__(self, workers=None, seed=0, chunk_size=64, cache=None, max_results=10**6):
+        # cache: optional ResultCache (sqlite) shared with parallel_round_robin
+        self.workers = workers or os.cpu_count() or 1
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.cache = cache
+        self.max_results = max_results
+        self.results = OrderedDict()  # pairing key -> (score_a, score_b), least recently used first
+        self.inflight = {}            # pairing key -> (future of its chunk, position in the chunk)
+        self.sweeps = OrderedDict()   # sweep job -> result or future
+        self.pool = None
+        # the sqlite cache is read and written by one thread of its own (a
+        # connection opened there), never on the event loop
+        self.cache_thread = None
+        self.db = None
+        self.unsaved = []      # (keys, results) of chunks not written yet
+        self.saving = False    # a write of the cache thread is running
+        self.counters = {"jobs": 0, "matches played": 0, "matches reused": 0, "matches shared": 0}
+
+    # ================== Pairings ================== #
+
+    async def _read_cache(self, keys):
+        # Results of keys found in the sqlite cache, kept in memory
+        hits = await asyncio.get_running_loop().run_in_executor(self.cache_thread, self.db.get_many, keys)
+        for (key, hit) in zip(keys, hits):
+            if hit is not None:
+                self._remember(key, hit)
+
+    def _remember(self, key, res):
+        self.results[key] = res
+        self.results.move_to_end(key)
+        while len(self.results) > self.max_results:
+            self.results.popitem(last=False)
+
+    def _store(self, keys, future):
+        # when a chunk is done: results kept, chunk no longer in flight
+        for key in keys:
+            self.inflight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        res = future.result()
+        for (key, r) in zip(keys, res):
+            self._remember(key, (float(r[0]), float(r[1])))
+        if self.db is not None:
+            self.unsaved.append((keys, res))
+            self._save()
+
+    def _save(self, done=None):
+        # One write at a time: the chunks that finish meanwhile are written
+        # together by the next one
+        if done is not None:
+            self.saving = False
+        if self.saving or not self.unsaved:
+            return
+        (chunks, self.unsaved, self.saving) = (self.unsaved, [], True)
+        future = asyncio.get_running_loop().run_in_executor(self.cache_thread, _write, self.db, chunks)
+        future.add_done_callback(self._save)
+
+    async def play(self, nb_of_games, strats, firsts, ia, ib, seed, exact, utility_matrix):
+        # Async generator of (positions, scores (k, 2)) as the pairings
+        # strats[ia[p]] vs strats[ib[p]] finish
+        loop = asyncio.get_running_loop()
+        strats, firsts = np.asarray(strats, dtype=float), np.asarray(firsts, dtype=float)
+        (ia, ib) = (np.asarray(ia), np.asarray(ib))
+        m = len(ia)
+        engine = "markov" if exact else "batch_game"
+        # O(pairs) hashing: off the event loop, so that other clients are served
+        keys_a, keys_b, keys = await loop.run_in_executor(None, _pair_keys, strats, firsts, ia.tolist(), ib.tolist(),
+                                                          nb_of_games, None if exact else seed, utility_matrix, engine)
+        if self.db is not None:
+            unknown = [key for key in set(keys) if key not in self.results and key not in self.inflight]
+            if unknown:
+                await self._read_cache(unknown)
+        # One pass over the pairings: results in memory (checked now, other
+        # jobs may have finished some while this one was waiting), pairings
+        # being played (shared), and new pairings. A new pairing goes into
+        # self.inflight as soon as it is seen, under a placeholder future of
+        # its chunk, so that a job scanning at the same time shares it even
+        # though the scan gives way to the other clients.
+        chunk_size = max(self.chunk_size, -(-m // 1024))
+        found, hits, waiting, chunks, own = {}, [], {}, [], set()
+        try:
+            for p in range(m):
+                if p % 8192 == 8191:
+                    await asyncio.sleep(0)
+                key = keys[p]
+                if key in found or key in self.results:
+                    if key not in found:
+                        self.results.move_to_end(key)
+                        found[key] = self.results[key]
+                    hits.append(p)
+                elif key in self.inflight:
+                    (future, i) = self.inflight[key]
+                    waiting.setdefault(future, []).append((p, i))
+                    if future not in own:
+                        self.counters["matches shared"] += 1
+                else:
+                    if not chunks or len(chunks[-1][1]) == chunk_size:
+                        (placeholder, chunk_keys) = (loop.create_future(), [])
+                        placeholder.add_done_callback(lambda f, chunk_keys=chunk_keys: self._store(chunk_keys, f))
+                        chunks.append((placeholder, chunk_keys, []))
+                        own.add(placeholder)
+                    (placeholder, chunk_keys, positions) = chunks[-1]
+                    self.inflight[key] = (placeholder, len(chunk_keys))
+                    waiting.setdefault(placeholder, []).append((p, len(chunk_keys)))
+                    chunk_keys.append(key)
+                    positions.append(p)
+        except BaseException:
+            for (placeholder, _, _) in chunks:
+                placeholder.cancel()
+            raise
+        # the chunks are played by the workers, their results go to the placeholders
+        for (placeholder, chunk_keys, positions) in chunks:
+            sl = np.array(positions)
+            (a, b) = (ia[sl], ib[sl])
+            if exact:
+                args = (nb_of_games, strats[a], firsts[a], strats[b], firsts[b], utility_matrix)
+                future = loop.run_in_executor(self.pool, _exact_matches, args)
+            else:
+                args = (nb_of_games, strats[a], firsts[a], strats[b], firsts[b], [keys_a[p] for p in positions],
+                        [keys_b[p] for p in positions], seed, utility_matrix)
+                future = loop.run_in_executor(self.pool, _seeded_matches, args)
+            future.add_done_callback(lambda f, placeholder=placeholder: _settle(placeholder, f))
+            self.counters["matches played"] += len(chunk_keys)
+        if hits:
+            self.counters["matches reused"] += len(hits)
+            yield np.array(hits), np.array([found[keys[p]] for p in hits])
+        # futures in the order they finish (asyncio.wait would go through
+        # all the pending ones at each completion)
+        finished = asyncio.Queue()
+        for future in waiting:
+            future.add_done_callback(finished.put_nowait)
+        for _ in range(len(waiting)):
+            future = await finished.get()
+            res = future.result()
+            positions = waiting[future]
+            yield np.array([p for (p, _) in positions]), res[[i for (_, i) in positions]]
+            # neither get() nor drain() gives way to the other clients when
+            # results are already waiting
+            await asyncio.sleep(0)
+
+    # ================== Jobs ================== #
+
+    async def tournament(self, job, send):
+        strategies = parse_strategies(job.get("strategies"))
+        strats, firsts = strategy_arrays(strategies)
+        n = len(firsts)
+        ia, ib = np.triu_indices(n)
+        res = np.zeros((len(ia), 2))
+        async for (positions, scores) in self.play(job.get("rounds", 1000), strats, firsts, ia, ib,
+                                                   job.get("seed", self.seed), job.get("exact", False), _utility(job)):
+            res[positions] = scores
+            await send({"type": "partial", "pairs": np.stack([ia[positions], ib[positions]], axis=1).tolist(),
+                        "scores": np.asarray(scores).tolist()})
+        scores = _fill_scores(n, ia, ib, res)
+        # scores left as an array: encoded in a worker (see handle)
+        return {"names": strategy_names(strategies), "scores": scores,
+                "ranking": [int(i) for i in ranking(scores)]}
+
+    async def match(self, job, send):
+        (strat_a, strat_b) = (_strategy(job["a"]), _strategy(job["b"]))
+        strats, firsts = strategy_arrays([strat_a, strat_b])
+        async for (_, scores) in self.play(job.get("rounds", 10000), strats, firsts, [0], [1],
+                                           job.get("seed", self.seed), job.get("exact", False), _utility(job)):
+            res = scores[0]
+        return {"names": strategy_names([strat_a, strat_b]), "scores": [float(res[0]), float(res[1])]}
+
+    async def sweep(self, job, send):
+        key = json.dumps({k: v for (k, v) in job.items() if k != "id"}, sort_keys=True)
+        if key not in self.sweeps:
+            self.sweeps[key] = asyncio.get_running_loop().run_in_executor(self.pool, _sweep, job)
+            while len(self.sweeps) > 256:
+                self.sweeps.popitem(last=False)
+        self.sweeps.move_to_end(key)
+        try:
+            return await asyncio.shield(self.sweeps[key])
+        except Exception:
+            self.sweeps.pop(key, None)
+            raise
+
+    async def stats(self, job, send):
+        return dict(self.counters, results=len(self.results), inflight=len(self.inflight), workers=self.workers)
+
+    async def run_job(self, job, send):
+        self.counters["jobs"] += 1
+        handler = {"match": self.match, "tournament": self.tournament, "sweep": self.sweep,
+                   "stats": self.stats}.get(job.get("job"))
+        try:
+            if handler is None:
+                raise ValueError("unknown job: %r" % job.get("job"))
+            result = await handler(job, send)
+        except Exception as error:
+            await send({"type": "error", "error": "%s: %s" % (type(error).__name__, error)})
+        else:
+            await send({"type": "done", "result": result})
+
+    async def handle(self, reader, writer):
+        lock = asyncio.Lock()
+        tasks = set()
+
+        def sender(job_id):
+            async def send(message):
+                message = dict(message, id=job_id)
+                if isinstance(message.get("result"), dict) and any(isinstance(v, np.ndarray)
+                                                                   for v in message["result"].values()):
+                    # a whole tournament: seconds of JSON, not on the event loop
+                    data = await asyncio.get_running_loop().run_in_executor(self.pool, _encode, message)
+                else:
+                    data = _encode(message)
+                async with lock:
+                    writer.write(data)
+                    await writer.drain()
+            return send
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError as error:
+                    # longer than line_limit (the rest of the line, if any,
+                    # comes next as invalid JSON)
+                    await sender(None)({"type": "error", "error": "job too long: %s" % error})
+                    continue
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    job = json.loads(line)
+                except ValueError as error:
+                    await sender(None)({"type": "error", "error": "invalid JSON: %s" % error})
+                    continue
+                if not isinstance(job, dict):
+                    await sender(None)({"type": "error", "error": "a job is a JSON object, not %s" % type(job).__name__})
+                    continue
+                task = asyncio.ensure_future(self.run_job(job, sender(job.get("id"))))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # ================== Start ================== #
+
+    async def start(self, path=None, host="127.0.0.1", port=8765):
+        # Starts the workers, imports numpy and ipd in each of them, then
+        # listens on the Unix socket `path` or on host:port
+        loop = asyncio.get_running_loop()
+        if self.cache is not None:
+            self.cache_thread = ThreadPoolExecutor(max_workers=1)
+            self.db = await loop.run_in_executor(self.cache_thread, ResultCache, self.cache.path, self.cache.max_entries)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        await asyncio.gather(*[loop.run_in_executor(self.pool, _warm_up) for _ in range(self.workers)])
+        if path is not None:
+            if os.path.exists(path):
+                os.remove(path)
+            return await asyncio.start_unix_server(self.handle, path=path, limit=self.line_limit)
+        return await asyncio.start_server(self.handle, host=host, port=port, limit=self.line_limit)
+
+    async def serve(self, path=None, host="127.0.0.1", port=8765, ready=None):
+        try:
+            server = await self.start(path, host, port)
+            if ready is not None:
+                ready()
+            async with server:
+                await server.serve_forever()
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+            if self.cache_thread is not None:
+                # the pending writes are finished first
+                self.cache_thread.submit(_write, self.db, self.unsaved)
+                self.cache_thread.submit(self.db.close)
+                self.cache_thread.shutdown()
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+def serve(path=None, host="127.0.0.1", port=8765, workers=None, seed=0, cache=None, ready=None):
+    # Blocking: runs a JobServer until interrupted
+    server = JobServer(workers=workers, seed=seed, cache=None if cache is None else ResultCache(cache))
+    try:
+        asyncio.run(server.serve(path, host, port, ready=ready))
+    except KeyboardInterrupt:
+        pass
+
+# ================== Client ================== #
+
+def submit(job, path=None, host="127.0.0.1", port=8765, timeout=None):
+    # Sends one job and yields the messages of the server until the job is
+    # done ({"type": "done"} or {"type": "error"}, yielded too)
+    job = dict(job)
+    job.setdefault("id", 0)
+    if path is not None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(path)
+    else:
+        sock = socket.create_connection((host, port), timeout=timeout)
+    with sock, sock.makefile("rwb") as f:
+        f.write((json.dumps(job) + "\n").encode())
+        f.flush()
+        for line in f:
+            message = json.loads(line)
+            yield message
+            if message.get("type") in ("done", "error"):
+                return
+
+def query(job, path=None, host="127.0.0.1", port=8765, timeout=None):
+    # The result of one job (partial messages skipped); errors raise RuntimeError
+    for message in submit(job, path, host, port, timeout):
+        if message["type"] == "error":
+            raise RuntimeError(message["error"])
+        if message["type"] == "done":
+            return message["result"]
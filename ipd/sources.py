@@ -0,0 +1,186 @@
+# ========================================================= #
+# =================== Strategy sources ==================== #
+# ========================================================= #
+
+import csv
+import hashlib
+import json
+
+import numpy as np
+
+from .strategies import _field, _memory_one_tables
+
+# Populations of memory-one strategies produced on demand, chunk_size at a
+# time, instead of module-level dicts. A source is re-iterable: iterating
+# over it gives the chunks (strats (m, 2, 2), firsts (m,), names), the
+# same ones at each pass. Sources are accepted wherever a list of
+# strategies is (strategy_arrays then loads them all), and
+# tiled_tournament and source_sweep read them one chunk at a time.
+#  - RandomStrategies: like strat_alea_total of the French version, n times
+#  - ParametricStrategies: a function of a table of parameters
+#  - FileStrategies: .csv, .jsonl or .json, .npy files (see write_strategies)
+
+class StrategySource:
+
+    chunk_size = 4096
+
+    def chunks(self):
+        raise NotImplementedError
+
+    def __iter__(self):
+        return self.chunks()
+
+    def __len__(self):
+        return sum(len(firsts) for (_, firsts, _) in self.chunks())
+
+    def arrays(self):
+        # The whole population: (n, 2, 2), (n,), names
+        strats, firsts, names = [np.zeros((0, 2, 2))], [np.zeros(0)], []
+        for (s, f, nm) in self.chunks():
+            strats.append(s)
+            firsts.append(f)
+            names.extend(nm)
+        return np.concatenate(strats), np.concatenate(firsts), names
+
+    def fingerprint(self):
+        # Hash of the strategies of the source (not of their names)
+        h = hashlib.sha256()
+        for (strats, firsts, _) in self.chunks():
+            h.update(np.ascontiguousarray(strats, dtype=float).tobytes())
+            h.update(np.ascontiguousarray(firsts, dtype=float).tobytes())
+        return h.hexdigest()
+
+class RandomStrategies(StrategySource):
+    # n strategies with uniform probabilities (pure=True: 0 or 1 only)
+
+    def __init__(self, n, chunk_size=4096, seed=None, pure=False, first=None, name="Random"):
+        self.n, self.chunk_size, self.pure, self.first, self.name = n, chunk_size, pure, first, name
+        # drawn once, so that every pass gives the same strategies
+        self.seed = np.random.SeedSequence(seed).entropy
+
+    def chunks(self):
+        # 5 numbers per strategy read in order: the population does not
+        # depend on chunk_size
+        rng = np.random.default_rng(self.seed)
+        for start in range(0, self.n, self.chunk_size):
+            m = min(self.chunk_size, self.n - start)
+            draws = rng.random((m, 5))
+            strats = draws[:, 1:].reshape(m, 2, 2)
+            firsts = draws[:, 0] if self.first is None else np.full(m, float(self.first))
+            if self.pure:
+                strats, firsts = np.round(strats), np.round(firsts)
+            yield strats, firsts, ["%s %d" % (self.name, start + k) for k in range(m)]
+
+    def __len__(self):
+        return self.n
+
+class ParametricStrategies(StrategySource):
+    # func(params) -> (strats (m, 2, 2), firsts (m,)) for a chunk of rows of
+    # params (m, p); names are name % tuple(row), "Strategy (row)" by default
+
+    def __init__(self, func, params, chunk_size=4096, name=None):
+        self.func, self.params, self.chunk_size, self.name = func, np.asarray(params), chunk_size, name
+        if self.params.ndim == 1:
+            self.params = self.params[:, None]
+
+    def chunks(self):
+        for start in range(0, len(self.params), self.chunk_size):
+            rows = self.params[start:start + self.chunk_size]
+            strats, firsts = self.func(rows)
+            strats = _memory_one_tables(strats)
+            firsts = np.broadcast_to(np.asarray(firsts, dtype=float), (len(rows),))
+            yield strats, firsts, [self._name(row) for row in rows.tolist()]
+
+    def _name(self, row):
+        if self.name is None:
+            return "Strategy (" + ", ".join("%g" % x for x in row) + ")"
+        return self.name % tuple(row)
+
+    def __len__(self):
+        return len(self.params)
+
+# ================== Files ================== #
+# One strategy per line or row: first move probability, then the
+# probabilities to cooperate after CC, CD, DC, DD (strat[a][b] in order).
+#  - .csv: columns name, first, cc, cd, dc, dd (with this header)
+#  - .jsonl: one {"name", "first", "strat"} object per line
+#  - .json: a list of such objects (loaded whole, then cut in chunks)
+#  - .npy: (n, 5) array first, cc, cd, dc, dd, read as a memmap
+
+_COLUMNS = ["name", "first", "cc", "cd", "dc", "dd"]
+
+def _rows_to_chunk(rows):
+    strats = _memory_one_tables(np.array([row[1] for row in rows], dtype=float))
+    firsts = np.array([row[0] for row in rows], dtype=float)
+    return strats, firsts, [row[2] for row in rows]
+
+class FileStrategies(StrategySource):
+
+    def __init__(self, path, chunk_size=4096):
+        self.path, self.chunk_size = path, chunk_size
+        if not path.endswith((".csv", ".jsonl", ".json", ".npy")):
+            raise ValueError("unknown strategy file type: %s" % path)
+
+    def _rows(self):
+        # (first, [cc, cd, dc, dd], name) for each strategy of the file
+        if self.path.endswith(".csv"):
+            with open(self.path, newline="") as f:
+                for row in csv.DictReader(f):
+                    yield (row["first"], [row[c] for c in _COLUMNS[2:]], row["name"])
+        elif self.path.endswith(".jsonl"):
+            with open(self.path) as f:
+                for line in f:
+                    if line.strip():
+                        strat = json.loads(line)
+                        yield (_field(strat, "first", "premier"), strat["strat"], _field(strat, "name", "nom"))
+        else:
+            with open(self.path) as f:
+                for strat in json.load(f):
+                    yield (_field(strat, "first", "premier"), strat["strat"], _field(strat, "name", "nom"))
+
+    def chunks(self):
+        if self.path.endswith(".npy"):
+            data = np.load(self.path, mmap_mode="r")
+            for start in range(0, len(data), self.chunk_size):
+                block = np.array(data[start:start + self.chunk_size], dtype=float)
+                names = ["Strategy %d" % (start + k) for k in range(len(block))]
+                yield block[:, 1:].reshape(-1, 2, 2), block[:, 0], names
+            return
+        rows = []
+        for row in self._rows():
+            rows.append(row)
+            if len(rows) == self.chunk_size:
+                yield _rows_to_chunk(rows)
+                rows = []
+        if rows:
+            yield _rows_to_chunk(rows)
+
+    def __len__(self):
+        if self.path.endswith(".npy"):
+            return len(np.load(self.path, mmap_mode="r"))
+        return sum(1 for _ in self._rows())
+
+def write_strategies(path, source):
+    # Writes a source to a .csv, .jsonl or .npy file, one chunk at a time
+    if path.endswith(".npy"):
+        data = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(len(source), 5))
+        start = 0
+        for (strats, firsts, _) in source:
+            data[start:start + len(firsts), 0] = firsts
+            data[start:start + len(firsts), 1:] = np.reshape(strats, (-1, 4))
+            start += len(firsts)
+        data.flush()
+        return
+    with open(path, "w", newline="") as f:
+        if path.endswith(".csv"):
+            writer = csv.writer(f)
+            writer.writerow(_COLUMNS)
+            for (strats, firsts, names) in source:
+                writer.writerows([name, repr(float(first))] + [repr(float(p)) for p in strat.reshape(4)]
+                                 for (strat, first, name) in zip(strats, firsts, names))
+        elif path.endswith(".jsonl"):
+            for (strats, firsts, names) in source:
+                for (strat, first, name) in zip(strats, firsts, names):
+                    f.write(json.dumps({"name": name, "first": float(first), "strat": strat.tolist()}) + "\n")
+        else:
+            raise ValueError("write_strategies writes .csv, .jsonl or .npy files")
@@ -0,0 +1,59 @@
+# ========================================================= #
+# ===================== Spatial game ====================== #
+# ========================================================= #
+
+import numpy as np
+
+# Each cell of a 2D grid (periodic borders) holds the id of a strategy and
+# plays against its neighbours. The scores come from the payoff table of
+# the strategies (computed once, e.g. with round_robin), so a generation
+# is a few whole-grid shifts, whatever the size of the grid. Then every
+# cell imitates the best-scoring cell among itself and its neighbours.
+
+NEIGHBOURHOODS = {"moore": [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)],
+                  "von_neumann": [(-1, 0), (1, 0), (0, -1), (0, 1)]}
+
+def random_grid(shape, nb_strategies, probabilities=None, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    return rng.choice(nb_strategies, size=shape, p=probabilities).astype(np.int32)
+
+def spatial_scores(grid, payoffs, neighbourhood="moore"):
+    # Total score of each cell against all its neighbours
+    k = len(payoffs)
+    flat = np.asarray(payoffs, dtype=float).reshape(-1)
+    base = grid*k
+    score = np.zeros(grid.shape)
+    for shift in NEIGHBOURHOODS[neighbourhood]:
+        score += flat[base + np.roll(grid, shift, axis=(0, 1))]
+    return score
+
+def spatial_step(grid, payoffs, neighbourhood="moore"):
+    # One generation: returns the new grid and the scores of the old one.
+    # Ties keep the current strategy.
+    score = spatial_scores(grid, payoffs, neighbourhood)
+    best_score = score.copy()
+    best = grid.copy()
+    for shift in NEIGHBOURHOODS[neighbourhood]:
+        neighbour_score = np.roll(score, shift, axis=(0, 1))
+        better = neighbour_score > best_score
+        best_score[better] = neighbour_score[better]
+        best[better] = np.roll(grid, shift, axis=(0, 1))[better]
+    return best, score
+
+def spatial_game(grid, payoffs, generations, neighbourhood="moore", snapshot_every=None, snapshot_path="spatial"):
+    # Returns the final grid and the number of cells of each strategy at
+    # each generation, shape (generations+1, k). Every snapshot_every
+    # generations the grid is saved to snapshot_path_<generation>.npy
+    k = len(payoffs)
+    grid = np.asarray(grid, dtype=np.int32)
+    counts = np.zeros((generations+1, k), dtype=np.int64)
+    counts[0] = np.bincount(grid.reshape(-1), minlength=k)
+    if snapshot_every:
+        np.save("%s_%06d.npy" % (snapshot_path, 0), grid)
+    for g in range(1, generations+1):
+        grid, _ = spatial_step(grid, payoffs, neighbourhood)
+        counts[g] = np.bincount(grid.reshape(-1), minlength=k)
+        if snapshot_every and g % snapshot_every == 0:
+            np.save("%s_%06d.npy" % (snapshot_path, g), grid)
+    return grid, counts
@@ -0,0 +1,358 @@
+# ========================================================= #
+# ====================== Strategies ======================= #
+# ========================================================= #
+
+import hashlib
+
+import numpy as np
+
+from .model import initial_game, S, P, R, T
+
+# These are global variables
+
+# ============ Strategies independant from the opponent ============ #
+
+all_c      = {"strat" : np.array([[1,1],
+                                  [1,1]]),
+                 "first" : 1,
+                 "name" : "Naive (all_c)"}
+                 
+all_d    = {"strat" : np.array([[0,0],
+                                [0,0]]),
+                 "first" : 0,
+                 "name" : "Thief (all_d)"}
+                 
+random_strat  = {"strat" : np.array([[0.5,0.5],
+                                     [0.5,0.5]]),
+                 "first" : 0.5,
+                 "name" : "Random"}
+                 
+strat_indecis = {"strat" : np.array([[0,0],
+                                     [1,1]]),
+                 "first" : 1,
+                 "name" : "Irresolute"}
+
+ 
+# ================== Deterministic (pure) strategies ================== #
+
+tit_for_tat = {"strat" : np.array([[1,0],   
+                                   [1,0]]),
+                 "first" : 1,
+                 "name" : "Copycat (tit for tat)"} 
+                 
+                 
+resentful = {"strat" : np.array([[1,0],
+                                 [0,0]]),
+                   "first" : 1,
+                   "name" : "Resentful"}            
+                 
+strat_inverse = {"strat" : np.array([[0,1],
+                                     [0,1]]),
+                 "first" : 1,
+                 "name" : "Inverse tit-for-tat"}
+                 
+# ================== Mixed strategies ================== #
+
+strat_conciliant = {"strat" : np.array([[1, 0.1],    
+                                        [1, 0.1]]),
+                   "first" : 1,
+                   "name" : "Accommodating"} 
+                    
+strat_prudent = {"strat" : np.array([[0.99, 0.5],    
+                                      [0.9, 0.1]]),
+                   "first" : 1,
+                   "name" : "Cautious"} 
+                   
+strat_inspiree =   {"strat" : np.array([[0.9,0.1],
+                                        [0.1,0.2]]),
+                    "first" : 1,
+                    "name" : "Inspired"}
+
+# ================== Stratégies Zero Determinant (ZD) ================== #
+# Ces stratégies sont le fruit du travail des informaticiens Press & Dyson
+# Pour plus d'information, consultez
+# https://sciencetonnante.wordpress.com/2017/03/03/la-theorie-des-jeux/ (simple)
+# http://www.pnas.org/content/109/26/10409.full (très technique)
+
+# Les formules acceptent aussi des tableaux numpy (voir zd_control_sweep)
+
+def zd_control_params(p1, p4):
+    # p2, p3 et le gain moyen imposé à l'adversaire
+    p2 = (p1*(T-P)-(1+p4)*(T-R))/(R-P)
+    p3 = ((1-p1)*(P-S)+p4*(R-S))/(R-P)
+    gain_moyen = ((1-p1)*P+p4*R)/(1-p1+p4)
+    return p2, p3, gain_moyen
+
+def zd_extortion_params(chi):
+    # phi, q1, q2, q3, q4
+    phi = 0.5 * (P-S)/((P-S) + chi*(T-P))
+    q1 = 1 - phi*(chi-1)*(R-P)/(P-S)
+    q2 = 1 - phi*(1 + chi*(T-P)/(P-S))
+    q3 = phi*(chi+ (T-P)/(P-S) )
+    q4 = 0*phi
+    return phi, q1, q2, q3, q4
+
+p1 = 0.9 # 0.9 pour gain de 2 / 0.0 pour un gain de 1
+p4 = 0.1 # 0.1 pour un gain de 2 / 0.0 pour un gain de 1
+(p2, p3, gain_moyen) = zd_control_params(p1, p4)
+
+# gain_moyen = 2 pour (0,1,3,5)
+strat_maitrise = {"strat" : np.array([[p1,p2],
+                                      [p3,p4]]),
+                  "first" : 1,
+                  "name" : "Control 2 (ZD)"}
+
+# La stratégie "extorque" impose un rapport fixe entre le gain du
+# joueur et celui de l'adversaire (pour 10 000 itérations)
+chi = 2
+(phi, q1, q2, q3, q4) = zd_extortion_params(chi)
+
+strat_extorque =   {"strat" : np.array([[q1,q2],
+                                        [q3,q4]]),
+                    "first" : 1,
+                    "name" : "Extortion 2 (ZD)"}
+
+# ================ List of strategies ================ #
+# dans le but de se les faire affronter entre elles
+# on les considère comme des variables globales
+
+liste_strat = [all_c, all_d, random_strat, strat_indecis,
+               tit_for_tat, resentful, 
+               strat_conciliant, strat_prudent,
+               strat_maitrise, strat_extorque]
+# Non inclus : inverse, inspiree qui n'ont que peu d'interêt
+
+# ================ Strategy registry ================ #
+# Many strategies stored as one (n, 2, 2) array of probabilities and one
+# (n,) array of first moves, the names on the side. A strategy is then an
+# integer id; Strategy is a small handle (registry, id) that behaves like
+# the strategy dicts above (s["strat"], s["first"], s["name"]).
+# The engines accept dicts, handles, integer ids (ids of the default
+# `strategy_registry`, where liste_strat is registered first) or a whole
+# registry.
+
+def _field(strat, key, french_key):
+    # The French version of the script uses "premier" and "nom"
+    return strat[key] if key in strat else strat[french_key]
+
+class Strategy:
+
+    __slots__ = ("registry", "id")
+
+    def __init__(self, registry, id):
+        self.registry = registry
+        self.id = id
+
+    @property
+    def strat(self):
+        return self.registry.strats[self.id]
+
+    @property
+    def first(self):
+        return self.registry.firsts[self.id]
+
+    @property
+    def name(self):
+        return self.registry.names[self.id]
+
+    def __getitem__(self, key):
+        if key == "strat":
+            return self.strat
+        if key in ("first", "premier"):
+            return self.first
+        if key in ("name", "nom"):
+            return self.name
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in ("strat", "first", "premier", "name", "nom")
+
+    def __eq__(self, other):
+        return isinstance(other, Strategy) and self.registry is other.registry and self.id == other.id
+
+    def __hash__(self):
+        return hash((id(self.registry), self.id))
+
+    def __repr__(self):
+        return "Strategy(%d, %r)" % (self.id, self.name)
+
+def _memory_one_tables(strats):
+    # (m, 2, 2) array of memory-one tables (or of m tables of 4 entries);
+    # a memory-n table would silently become wrong 2x2 blocks
+    strats = np.asarray(strats, dtype=float)
+    if strats.size == 0:
+        return strats.reshape(0, 2, 2)
+    if strats.ndim < 2 or strats.shape[1:] not in ((2, 2), (4,)):
+        raise ValueError("expected memory-one strategies (2x2 tables), got an array of shape %s" % (strats.shape,))
+    return strats.reshape(-1, 2, 2)
+
+class StrategyRegistry:
+
+    def __init__(self, strategies=(), capacity=16):
+        self._strats = np.zeros((capacity, 2, 2))
+        self._firsts = np.zeros(capacity)
+        self.names = []
+        for strat in strategies:
+            self.add(strat)
+
+    @property
+    def strats(self):
+        return self._strats[:len(self.names)]
+
+    @property
+    def firsts(self):
+        return self._firsts[:len(self.names)]
+
+    def _reserve(self, n):
+        if n > len(self._firsts):
+            capacity = max(n, 2*len(self._firsts))
+            strats, firsts = np.zeros((capacity, 2, 2)), np.zeros(capacity)
+            strats[:len(self.names)] = self.strats
+            firsts[:len(self.names)] = self.firsts
+            self._strats, self._firsts = strats, firsts
+
+    def add(self, strat, first=None, name=None):
+        # strat: a strategy dict (English or French keys) or a 2x2 matrix
+        if isinstance(strat, (dict, Strategy)):
+            (strat, first, name) = (strat["strat"], _field(strat, "first", "premier"), _field(strat, "name", "nom"))
+        return Strategy(self, self.add_many([strat], [first], [name])[0])
+
+    def add_many(self, strats, firsts, names=None):
+        # Adds arrays of strategies (m, 2, 2) and (m,), returns their ids
+        strats = _memory_one_tables(strats)
+        n, m = len(self.names), len(strats)
+        if names is None:
+            names = ["Strategy %d" % (n+k) for k in range(m)]
+        self._reserve(n + m)
+        self._strats[n:n+m] = strats
+        self._firsts[n:n+m] = firsts
+        self.names.extend(names)
+        return range(n, n+m)
+
+    def arrays(self, ids=None):
+        if ids is None:
+            return self.strats, self.firsts
+        ids = np.asarray(ids, dtype=np.intp)
+        return self.strats[ids], self.firsts[ids]
+
+    def index(self, name):
+        return self.names.index(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, id):
+        if not -len(self.names) <= id < len(self.names):
+            raise IndexError(id)
+        return Strategy(self, id % len(self.names))
+
+    def __iter__(self):
+        return (Strategy(self, id) for id in range(len(self.names)))
+
+strategy_registry = StrategyRegistry(liste_strat)
+
+def _is_id(strat):
+    return isinstance(strat, (int, np.integer))
+
+def resolve_strategy(strat):
+    # Integer ids become handles of the default registry
+    return strategy_registry[int(strat)] if _is_id(strat) else strat
+
+def resolve_strategies(strategies):
+    if isinstance(strategies, StrategyRegistry):
+        return list(strategies)
+    if hasattr(strategies, "chunks"):
+        registry = StrategyRegistry()
+        for (strats, firsts, names) in strategies.chunks():
+            registry.add_many(strats, firsts, names)
+        return list(registry)
+    return [resolve_strategy(strat) for strat in strategies]
+
+def strategy_names(strategies):
+    if isinstance(strategies, StrategyRegistry):
+        return list(strategies.names)
+    if hasattr(strategies, "chunks"):
+        return [name for (_, _, names) in strategies.chunks() for name in names]
+    return [_field(resolve_strategy(strat), "name", "nom") for strat in strategies]
+
+# ================ Memory-n strategies ================ #
+# A memory-n strategy looks at the last n joint moves. They are packed in
+# an integer state, 2 bits per round, the last round in the lowest bits:
+# state = sum over k < n of (2*own + opp)[k rounds ago] << 2k.
+# "strat" is then a table of 4**n probabilities to cooperate, and the
+# decision is one lookup, like strat[a][b] for memory-one strategies
+# (a memory-one table is strat.reshape(4)). Before the first n rounds,
+# the missing history is initial_game.
+# Memory-n strategies work with iterated_game and markov_game; the batch
+# engines and the registry only take memory-one strategies (ValueError).
+
+def memory_of(strat):
+    return strat["memory"] if "memory" in strat else 1
+
+def memory_n_strategy(rule, memory, first=1, name="Memory-n"):
+    # rule(history) -> probability to cooperate, history being the list of
+    # the last `memory` joint moves (own, opp), the last one first
+    table = np.zeros(4**memory)
+    for state in range(4**memory):
+        history = [((state >> 2*k) >> 1 & 1, (state >> 2*k) & 1) for k in range(memory)]
+        table[state] = rule(history)
+    return {"strat": table, "memory": memory, "first": first, "name": name}
+
+def _padding_state(memory):
+    joint = 2*initial_game[0] + initial_game[1]
+    return sum(joint << 2*k for k in range(memory))
+
+def _swap_states(memory):
+    # state seen by the other player: (own, opp) -> (opp, own) in each round
+    states = np.arange(4**memory)
+    swapped = np.zeros_like(states)
+    for k in range(memory):
+        joint = (states >> 2*k) & 3
+        swapped |= ((joint >> 1) | ((joint & 1) << 1)) << 2*k
+    return swapped
+
+def memory_tables(strat_a, strat_b):
+    # Tables of both players over the states of A (memory = the largest of
+    # the two): table_a[s] and table_b[s] are the probabilities that A and B
+    # cooperate after the history s seen by A
+    memory = max(memory_of(strat_a), memory_of(strat_b))
+    states = np.arange(4**memory)
+    def lift(strat):
+        table = np.asarray(strat["strat"], dtype=float).reshape(-1)
+        return table[states & (len(table) - 1)]
+    return lift(strat_a), lift(strat_b)[_swap_states(memory)], memory
+
+tit_for_two_tats = memory_n_strategy(lambda h: 0 if h[0][1] == 1 and h[1][1] == 1 else 1, 2,
+                                     first=1, name="Tit for two tats")
+
+# ================ Arrays and keys ================ #
+
+def strategy_arrays(strategies):
+    # (n, 2, 2) and (n,) arrays of a list of strategies (dicts, handles or
+    # ids of strategy_registry), of a whole StrategyRegistry or of a
+    # strategy source (see sources.py, loaded whole)
+    if isinstance(strategies, StrategyRegistry):
+        return strategies.strats, strategies.firsts
+    if hasattr(strategies, "chunks"):
+        return strategies.arrays()[:2]
+    if isinstance(strategies, np.ndarray) and strategies.dtype.kind in "iu":
+        return strategy_registry.arrays(strategies)
+    strategies = resolve_strategies(strategies)
+    for s in strategies:
+        if np.size(s["strat"]) != 4:
+            raise ValueError("%s is not a memory-one strategy: use iterated_game or markov_game"
+                             % _field(s, "name", "nom"))
+    strats = _memory_one_tables([s["strat"] for s in strategies])
+    firsts = np.array([_field(s, "first", "premier") for s in strategies], dtype=float)
+    return strats, firsts
+
+def strategy_key(strat, first=None):
+    # Hash of what defines the behaviour of a strategy (not its name).
+    # strat: a strategy (dict, handle or id), or its matrix and first move
+    if first is None:
+        strat = resolve_strategy(strat)
+        (strat, first) = (strat["strat"], _field(strat, "first", "premier"))
+    h = hashlib.sha256()
+    h.update(np.asarray(strat, dtype=float).tobytes())
+    h.update(np.float64(first).tobytes())
+    return h.hexdigest()
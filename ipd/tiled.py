@@ -0,0 +1,199 @@
+# ========================================================= #
+# ==================== Tiled tournament =================== #
+# ========================================================= #
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .model import utility_matrix
+from .strategies import strategy_arrays, strategy_key
+from .instrument import NO_INSTRUMENT
+from .batch import batch_game
+from .markov import markov_batch_game
+from .game import match_seed
+
+# A round robin too large for memory: the (n, n) scores matrix of
+# round_robin is a .npy file opened as a memmap, filled one tile of
+# tile_size x tile_size pairs at a time. The workers write their tiles in
+# the memmap; after each tile it is flushed and path.json records the tile
+# as done, so a killed run started again with the same arguments only
+# plays the missing tiles (a tile written but not recorded is played again,
+# with the same scores).
+# Each match has its own random stream (match_seed, as in
+# parallel_round_robin): a tile gives the same scores whenever it is
+# played, and the whole matrix is the one of parallel_round_robin with the
+# same seed.
+
+def _tiles(n, tile_size):
+    # Tiles (I, J) of the upper triangle, I <= J
+    k = -(-n // tile_size)
+    return [(I, J) for I in range(k) for J in range(I, k)]
+
+def _play_tile(args, batch_size=4096):
+    # Runs in a worker process: plays the tile a few rows at a time (at most
+    # batch_size pairs, with their random streams) and writes the scores
+    # straight into the memmap, so that memory does not grow with the tile.
+    # Returns the number of matches played.
+    (path, nb_of_games, start_i, strats_i, firsts_i, keys_i, start_j, strats_j, firsts_j, keys_j,
+     seed, exact, utility_matrix) = args
+    scores = np.load(path + ".npy", mmap_mode="r+")
+    cols = np.arange(len(firsts_j))
+    step = max(1, batch_size // len(cols))
+    matches = 0
+    for r in range(0, len(firsts_i), step):
+        rows = np.arange(r, min(r + step, len(firsts_i)))
+        la, lb = np.repeat(rows, len(cols)), np.tile(cols, len(rows))
+        (ia, ib) = (la + start_i, lb + start_j)
+        keep = ia <= ib
+        (la, lb, ia, ib) = (la[keep], lb[keep], ia[keep], ib[keep])
+        if exact:
+            res = markov_batch_game(nb_of_games, strats_i[la], firsts_i[la], strats_j[lb], firsts_j[lb],
+                                    utility_matrix=utility_matrix)
+        else:
+            rngs = [np.random.default_rng(match_seed(seed, keys_i[a], keys_j[b])) for (a, b) in zip(la, lb)]
+            res = batch_game(nb_of_games, strats_i[la], firsts_i[la], strats_j[lb], firsts_j[lb], rng=rngs,
+                             utility_matrix=utility_matrix)
+        scores[ia, ib] = res[:, 0]
+        scores[ib, ia] = res[:, 1]
+        # a strategy against itself: both sides are the same player
+        diag = ia == ib
+        scores[ia[diag], ia[diag]] = res[diag].mean(axis=1)
+        matches += len(ia)
+    scores.flush()
+    return matches
+
+def _fingerprint(strats, firsts):
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(strats, dtype=float).tobytes())
+    h.update(np.ascontiguousarray(firsts, dtype=float).tobytes())
+    return h.hexdigest()
+
+def _save_checkpoint(path, checkpoint):
+    with open(path + ".json.tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".json.tmp", path + ".json")
+
+def load_checkpoint(path):
+    with open(path + ".json") as f:
+        return json.load(f)
+
+def _blocks(strategies, tile_size):
+    # (n, fingerprint, function giving the tiles of strategies in order):
+    # slices of the arrays, or the chunks of a strategy source
+    if hasattr(strategies, "chunks"):
+        def blocks():
+            for (k, (strats, firsts, _)) in enumerate(strategies.chunks()):
+                if k*tile_size + len(firsts) > n or (len(firsts) != tile_size and k*tile_size + len(firsts) != n):
+                    raise ValueError("the chunks of the source must all have chunk_size strategies but the last")
+                yield strats, firsts
+        n = len(strategies)
+        return n, strategies.fingerprint(), blocks
+    strats, firsts = strategy_arrays(strategies)
+    def blocks():
+        for start in range(0, len(firsts), tile_size):
+            yield strats[start:start + tile_size], firsts[start:start + tile_size]
+    return len(firsts), _fingerprint(strats, firsts), blocks
+
+def tiled_tournament(strategies, nb_of_games, path="tournament_scores", tile_size=1024, seed=None, exact=False,
+                     workers=1, utility_matrix=utility_matrix, instrument=None):
+    # Fills path.npy (scores, read-only memmap returned) and path.json (the
+    # checkpoint). seed=None: a fresh seed, or the one of the checkpoint
+    # when resuming. Resuming with other strategies, rounds, payoffs or
+    # tile size raises ValueError.
+    # strategies: as for round_robin, or a strategy source (sources.py)
+    # read one chunk at a time, the tiles being its chunks
+    if instrument is None:
+        instrument = NO_INSTRUMENT
+    if hasattr(strategies, "chunks"):
+        tile_size = strategies.chunk_size
+    (n, fingerprint, blocks) = _blocks(strategies, tile_size)
+    settings = {"n": n, "nb_of_games": nb_of_games, "exact": bool(exact), "tile_size": tile_size,
+                "utility": np.asarray(utility_matrix, dtype=float).tolist(),
+                "strategies": fingerprint}
+    if os.path.exists(path + ".json") and os.path.exists(path + ".npy"):
+        checkpoint = load_checkpoint(path)
+        for key, value in settings.items():
+            if checkpoint[key] != value:
+                raise ValueError("%s.json was written with another %s" % (path, key))
+        if seed is not None and checkpoint["seed"] != seed:
+            raise ValueError("%s.json was written with seed %s" % (path, checkpoint["seed"]))
+    else:
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        checkpoint = dict(settings, seed=seed, done=[])
+        # created here, filled by _play_tile
+        np.lib.format.open_memmap(path + ".npy", mode="w+", dtype=np.float64, shape=(n, n)).flush()
+        _save_checkpoint(path, checkpoint)
+    seed = checkpoint["seed"]
+    done = {tuple(tile) for tile in checkpoint["done"]}
+    nb_tiles = len(_tiles(n, tile_size))
+
+    def tasks():
+        # the strategies of two tiles in memory at a time (besides the
+        # tiles sent to the workers)
+        for (I, (strats_i, firsts_i)) in enumerate(blocks()):
+            if all((I, J) in done for J in range(I, -(-n // tile_size))):
+                continue
+            keys_i = None if exact else [strategy_key(strats_i[k], firsts_i[k]) for k in range(len(firsts_i))]
+            for (J, (strats_j, firsts_j)) in enumerate(blocks()):
+                if J < I or (I, J) in done:
+                    continue
+                keys_j = None if exact else [strategy_key(strats_j[k], firsts_j[k]) for k in range(len(firsts_j))]
+                yield (I, J), (path, nb_of_games, I*tile_size, strats_i, firsts_i, keys_i,
+                               J*tile_size, strats_j, firsts_j, keys_j, seed, exact, utility_matrix)
+
+    def results():
+        if workers == 1:
+            for (tile, args) in tasks():
+                yield tile, _play_tile(args)
+            return
+        # at most 2*workers tiles submitted ahead
+        pending = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            try:
+                for (tile, args) in tasks():
+                    pending.append((tile, pool.submit(_play_tile, args)))
+                    if len(pending) >= 2*workers:
+                        (tile, future) = pending.pop(0)
+                        yield tile, future.result()
+                for (tile, future) in pending:
+                    yield tile, future.result()
+            finally:
+                for (_, future) in pending:
+                    future.cancel()
+
+    instrument.count("tiles reused", len(done))
+    with instrument.stage("tournament"):
+        for ((I, J), matches) in results():
+            # the tile is flushed by _play_tile before it is marked as done
+            checkpoint["done"].append([I, J])
+            _save_checkpoint(path, checkpoint)
+            instrument.count("matches", matches)
+            if not exact:
+                instrument.count("rounds", matches*nb_of_games)
+            instrument.progress("tiles", len(checkpoint["done"]), nb_tiles)
+    return np.load(path + ".npy", mmap_mode="r")
+
+def tiled_summary(path="tournament_scores", chunk_rows=1024):
+    # Mean score of each strategy (row means), mean score of its opponents
+    # against it (column means), ranking (best first, like ranking()) and
+    # rank of each strategy, reading chunk_rows rows of the memmap at a time
+    checkpoint = load_checkpoint(path)
+    if len(checkpoint["done"]) < len(_tiles(checkpoint["n"], checkpoint["tile_size"])):
+        raise ValueError("the tournament in %s.npy is not finished" % path)
+    scores = np.load(path + ".npy", mmap_mode="r")
+    n = len(scores)
+    row_mean = np.zeros(n)
+    col_sum = np.zeros(n)
+    for start in range(0, n, chunk_rows):
+        block = np.asarray(scores[start:start + chunk_rows])
+        row_mean[start:start + chunk_rows] = block.mean(axis=1)
+        col_sum += block.sum(axis=0)
+    order = np.argsort(-row_mean, kind="stable")
+    rank = np.empty(n, dtype=np.intp)
+    rank[order] = np.arange(n)
+    return {"row_mean": row_mean, "col_mean": col_sum / n, "ranking": order, "rank": rank}
@@ -0,0 +1,175 @@
+# ========================================================= #
+# ====================== Tournaments ====================== #
+# ========================================================= #
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+
+from .model import utility_matrix
+from .strategies import strategy_arrays, strategy_key
+from .instrument import NO_INSTRUMENT
+from .batch import _advance_matches, batch_game
+from .markov import markov_batch_game
+from .game import match_seed
+
+# ================== Round robin tournament ================== #
+# scores[i][j] is the mean score of strategy i against strategy j, so the
+# score of j in the same match is scores[j][i]. Each unordered pair
+# (self-play included) is played exactly once.
+
+def round_robin(strategies, nb_of_games, exact=False, rng=None, utility_matrix=utility_matrix, instrument=None):
+    if instrument is None:
+        instrument = NO_INSTRUMENT
+    strats, firsts = strategy_arrays(strategies)
+    n = len(firsts)
+    ia, ib = np.triu_indices(n)
+    with instrument.stage("tournament"):
+        if exact:
+            res = markov_batch_game(nb_of_games, strats[ia], firsts[ia], strats[ib], firsts[ib], utility_matrix=utility_matrix)
+        else:
+            res = batch_game(nb_of_games, strats[ia], firsts[ia], strats[ib], firsts[ib], rng=rng, utility_matrix=utility_matrix,
+                             instrument=instrument)
+            instrument.count("rounds", len(ia)*nb_of_games)
+    instrument.count("matches", len(ia))
+    scores = _fill_scores(n, ia, ib, res)
+    return scores, ranking(scores)
+
+def _fill_scores(n, ia, ib, res):
+    scores = np.zeros((n, n))
+    scores[ia, ib] = res[:, 0]
+    scores[ib, ia] = res[:, 1]
+    # a strategy against itself: both sides are the same player
+    diag = ia == ib
+    scores[ia[diag], ia[diag]] = res[diag].mean(axis=1)
+    return scores
+
+def ranking(scores):
+    # Strategies sorted by mean score over all their opponents, best first
+    return np.argsort(-np.mean(scores, axis=1), kind="stable")
+
+# ================== Parallel tournament ================== #
+# Each match has its own random stream, derived from a master seed and the
+# content of the two strategies. The results do not depend on how the
+# matches are split between processes: same seed, same scores, whatever
+# the number of workers.
+
+def _play_matches(args):
+    # Runs in a worker process
+    (nb_of_games, strats_a, firsts_a, strats_b, firsts_b, seeds, utility_matrix) = args
+    rngs = [np.random.default_rng(seq) for seq in seeds]
+    return batch_game(nb_of_games, strats_a, firsts_a, strats_b, firsts_b, rng=rngs, utility_matrix=utility_matrix)
+
+def parallel_round_robin(strategies, nb_of_games, seed=None, workers=None, chunk_size=None, utility_matrix=utility_matrix,
+                         cache=None, instrument=None):
+    # Same output as round_robin, the pairs are spread over a process pool.
+    # seed=None draws a fresh master seed (not reproducible, and not cached).
+    # With a ResultCache, only the pairs missing from the cache are played.
+    if instrument is None:
+        instrument = NO_INSTRUMENT
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+        cache = None
+    if workers is None:
+        workers = os.cpu_count() or 1
+    strats, firsts = strategy_arrays(strategies)
+    n = len(firsts)
+    ia, ib = np.triu_indices(n)
+    keys = [strategy_key(strats[i], firsts[i]) for i in range(n)]
+    res = np.zeros((len(ia), 2))
+    todo = np.arange(len(ia))
+    if cache is not None:
+        cache_keys = [cache.key(keys[i], keys[j], nb_of_games, seed, utility_matrix, "batch_game") for (i, j) in zip(ia, ib)]
+        hits = cache.get_many(cache_keys)
+        for p, hit in enumerate(hits):
+            if hit is not None:
+                res[p] = hit
+        todo = np.array([p for p, hit in enumerate(hits) if hit is None], dtype=np.intp)
+    seeds = [match_seed(seed, keys[ia[p]], keys[ib[p]]) for p in todo]
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(seeds) // (4*workers)))
+    chunks = []
+    for start in range(0, len(seeds), chunk_size):
+        sl = todo[start:start + chunk_size]
+        chunks.append((nb_of_games, strats[ia[sl]], firsts[ia[sl]], strats[ib[sl]], firsts[ib[sl]],
+                       seeds[start:start + chunk_size], utility_matrix))
+    instrument.count("cache hits", len(ia) - len(todo))
+    with instrument.stage("tournament"):
+        if workers == 1:
+            results = map(_play_matches, chunks)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            results = pool.map(_play_matches, chunks)
+        done = []
+        for res_chunk in results:
+            done.append(res_chunk)
+            instrument.progress("matches", sum(len(r) for r in done), len(todo))
+        results = done
+        if pool is not None:
+            pool.shutdown()
+    instrument.count("matches", len(todo))
+    instrument.count("rounds", len(todo)*nb_of_games)
+    if len(todo):
+        res[todo] = np.concatenate(results)
+        if cache is not None:
+            cache.put_many([(cache_keys[p], tuple(res[p])) for p in todo])
+    scores = _fill_scores(n, ia, ib, res)
+    return scores, ranking(scores)
+
+# ================== Adaptive precision ================== #
+# Instead of a fixed number of rounds, each pair plays `replicates`
+# independent matches, block_size rounds at a time, until the confidence
+# interval on both mean scores is narrower than +/- precision (or until
+# max_rounds rounds per match). Deterministic pairs stop after one block.
+
+def adaptive_batch_game(strats_a, firsts_a, strats_b, firsts_b, precision, confidence=0.95, replicates=16,
+                        block_size=256, max_rounds=10**6, rng=None, utility_matrix=utility_matrix):
+    # Returns the mean scores (m, 2), the half-widths of their confidence
+    # intervals (m, 2) and the number of rounds played per match (m,)
+    if replicates < 2:
+        raise ValueError("replicates must be at least 2 to estimate a confidence interval")
+    if rng is None:
+        rng = np.random.default_rng()
+    z = NormalDist().inv_cdf((1 + confidence)/2)
+    m = len(firsts_a)
+    rep = np.repeat(np.arange(m), replicates)
+    strats_a, strats_b = np.asarray(strats_a, dtype=float)[rep], np.asarray(strats_b, dtype=float)[rep]
+    firsts_a, firsts_b = np.asarray(firsts_a, dtype=float)[rep], np.asarray(firsts_b, dtype=float)[rep]
+    U = np.reshape(utility_matrix, (4, 2))
+    counts = np.zeros((m*replicates, 4), dtype=np.int64)
+    state = np.zeros(m*replicates, dtype=np.intp)
+    rounds = np.zeros(m, dtype=np.int64)
+    active = np.ones(m, dtype=bool)
+    started = False
+    while active.any():
+        # the active pairs have all played the same number of rounds
+        k = int(min(block_size, max_rounds - rounds[active][0]))
+        idx = np.flatnonzero(active[rep])
+        c, new_state = _advance_matches(k, strats_a[idx], firsts_a[idx], strats_b[idx], firsts_b[idx],
+                                        state[idx] if started else None, rng, block_size)
+        started = True
+        counts[idx] += c
+        state[idx] = new_state
+        rounds[active] += k
+        # mean score of each replicate, then mean and CI over the replicates
+        x = ((counts @ U) / rounds[rep][:, None]).reshape(m, replicates, 2)
+        mean = x.mean(axis=1)
+        half = z*x.std(axis=1, ddof=1)/np.sqrt(replicates)
+        active = (half > precision).any(axis=1) & (rounds < max_rounds)
+    return mean, half, rounds
+
+def adaptive_game(strat_a, strat_b, precision, confidence=0.95, replicates=16, block_size=256,
+                  max_rounds=10**6, rng=None, utility_matrix=utility_matrix):
+    # {"mean": (a, b), "ci": (+/- a, +/- b), "rounds": rounds per match, "replicates": ...}
+    strats_a, firsts_a = strategy_arrays([strat_a])
+    strats_b, firsts_b = strategy_arrays([strat_b])
+    mean, half, rounds = adaptive_batch_game(strats_a, firsts_a, strats_b, firsts_b, precision, confidence=confidence,
+                                             replicates=replicates, block_size=block_size, max_rounds=max_rounds,
+                                             rng=rng, utility_matrix=utility_matrix)
+    return {"mean": (float(mean[0][0]), float(mean[0][1])),
+            "ci": (float(half[0][0]), float(half[0][1])),
+            "rounds": int(rounds[0]),
+            "replicates": replicates}
@@ -0,0 +1,114 @@
+# ========================================================= #
+# ================ Convergence trajectory ================= #
+# ========================================================= #
+
+# Running mean scores of a match, kept with at most max_points points
+# whatever the length of the match:
+#  - mode "log": checkpoints at log-spaced rounds; when there are too many
+#    (nb_of_games unknown or too many early rounds), every other one is
+#    dropped and the ratio between checkpoints is squared
+#  - mode "minmax": the match is cut into buckets of equal width, each
+#    bucket keeps the min and max of the running means; when there are too
+#    many buckets, neighbours are merged and the width doubles.
+# stream: optional path (or open text file) receiving "round,mean_a,mean_b"
+# lines while the match runs (for "minmax", one line per closed bucket).
+
+class TrajectoryRecorder:
+
+    def __init__(self, nb_of_games=None, max_points=2000, mode="log", stream=None):
+        if mode not in ("log", "minmax"):
+            raise ValueError("mode must be 'log' or 'minmax'")
+        self.mode = mode
+        self.max_points = max_points
+        if nb_of_games is not None and nb_of_games > 1:
+            self.ratio = max(nb_of_games**(1/max_points), 1 + 1e-9)
+        else:
+            self.ratio = 1.01
+        self.next = 1
+        self.width = 1
+        self.rounds, self.means_a, self.means_b = [], [], []
+        self.bucket = None  # [first round, last round, min_a, max_a, min_b, max_b, mean_a, mean_b]
+        self.min_a, self.max_a, self.min_b, self.max_b = [], [], [], []
+        self.last = None
+        self.own_stream = isinstance(stream, str)
+        self.stream = open(stream, "w") if self.own_stream else stream
+        if self.stream is not None:
+            self.stream.write("round,mean_a,mean_b\n")
+
+    def record(self, n, gain_a, gain_b):
+        # n rounds played, total gains gain_a and gain_b
+        if self.mode == "log":
+            if n >= self.next:
+                self._point(n, gain_a/n, gain_b/n)
+                if len(self.rounds) >= self.max_points:
+                    for L in (self.rounds, self.means_a, self.means_b):
+                        L[:] = L[::2]
+                    self.ratio *= self.ratio
+                self.next = max(n + 1, int(self.next*self.ratio))
+            else:
+                self.last = (n, gain_a, gain_b)
+            return
+        mean_a, mean_b = gain_a/n, gain_b/n
+        bucket = self.bucket
+        if bucket is None:
+            self.bucket = [n, n, mean_a, mean_a, mean_b, mean_b, mean_a, mean_b]
+        else:
+            bucket[1] = n
+            bucket[2] = min(bucket[2], mean_a)
+            bucket[3] = max(bucket[3], mean_a)
+            bucket[4] = min(bucket[4], mean_b)
+            bucket[5] = max(bucket[5], mean_b)
+            bucket[6], bucket[7] = mean_a, mean_b
+        if n - self.bucket[0] + 1 >= self.width:
+            self._close_bucket()
+
+    def _point(self, n, mean_a, mean_b):
+        self.rounds.append(n)
+        self.means_a.append(mean_a)
+        self.means_b.append(mean_b)
+        self.last = None
+        if self.stream is not None:
+            self.stream.write("%d,%r,%r\n" % (n, mean_a, mean_b))
+
+    def _close_bucket(self):
+        (_, n, min_a, max_a, min_b, max_b, mean_a, mean_b) = self.bucket
+        self.bucket = None
+        self._point(n, mean_a, mean_b)
+        self.min_a.append(min_a)
+        self.max_a.append(max_a)
+        self.min_b.append(min_b)
+        self.max_b.append(max_b)
+        if len(self.rounds) >= self.max_points:
+            # merge neighbouring buckets two by two
+            for L, f in ((self.rounds, max), (self.min_a, min), (self.min_b, min),
+                         (self.max_a, max), (self.max_b, max)):
+                L[:] = [f(L[k:k+2]) for k in range(0, len(L), 2)]
+            self.means_a[:] = self.means_a[1::2] + self.means_a[-1:]*(len(self.means_a) % 2)
+            self.means_b[:] = self.means_b[1::2] + self.means_b[-1:]*(len(self.means_b) % 2)
+            self.width *= 2
+
+    def close(self):
+        # Records the last round and closes the stream
+        if self.mode == "log" and self.last is not None:
+            (n, gain_a, gain_b) = self.last
+            self._point(n, gain_a/n, gain_b/n)
+        if self.mode == "minmax" and self.bucket is not None:
+            self._close_bucket()
+        if self.own_stream:
+            self.stream.close()
+        elif self.stream is not None:
+            self.stream.flush()
+
+    def plot(self, name_a="", name_b=""):
+        import matplotlib.pyplot as plt
+        plt.plot(self.rounds, self.means_a, "r")
+        plt.plot(self.rounds, self.means_b, "b")
+        if self.mode == "minmax":
+            plt.fill_between(self.rounds, self.min_a, self.max_a, color="r", alpha=0.3)
+            plt.fill_between(self.rounds, self.min_b, self.max_b, color="b", alpha=0.3)
+        else:
+            plt.xscale("log")
+        plt.axhline(1, color="g")
+        plt.xlabel("Red : "+name_a+" - Blue : "+name_b)
+        plt.ylabel("Mean score")
+        plt.show()
@@ -0,0 +1,79 @@
+# ========================================================= #
+# ================ Zero Determinant sweep ================= #
+# ========================================================= #
+
+import numpy as np
+
+from .model import utility_matrix
+from .strategies import liste_strat, strategy_arrays, zd_control_params, zd_extortion_params
+from .markov import markov_batch_game
+
+# Scores whole families of ZD strategies against a list of opponents:
+# the combinations that do not give probabilities are dropped (NaN in the
+# results), the valid ones are stacked in one (m, 2, 2) array and scored
+# exactly against every opponent with markov_batch_game.
+# scores[..., j, 0] is the score of the ZD strategy against opponents[j],
+# scores[..., j, 1] the score of the opponent.
+
+def _valid_probabilities(strats, tol=1e-12):
+    finite = np.isfinite(strats).all(axis=(-1, -2))
+    with np.errstate(invalid="ignore"):
+        inside = ((strats >= -tol) & (strats <= 1 + tol)).all(axis=(-1, -2))
+    return finite & inside
+
+def _score_candidates(strats, first, opponents, nb_of_games, chunk_size, utility_matrix):
+    # strats (m, 2, 2) against every opponent: (m, len(opponents), 2).
+    # first: one first move for all, or one per candidate
+    opp_strats, opp_firsts = strategy_arrays(opponents)
+    m, n = len(strats), len(opponents)
+    ia, ib = np.repeat(np.arange(m), n), np.tile(np.arange(n), m)
+    firsts = np.broadcast_to(np.asarray(first, dtype=float), (m,))
+    res = np.zeros((m*n, 2))
+    for start in range(0, m*n, chunk_size):
+        sl = slice(start, start + chunk_size)
+        res[sl] = markov_batch_game(nb_of_games, strats[ia[sl]], firsts[ia[sl]], opp_strats[ib[sl]], opp_firsts[ib[sl]],
+                                    utility_matrix=utility_matrix)
+    return res.reshape(m, n, 2)
+
+def zd_control_sweep(p1_values, p4_values, opponents=liste_strat, nb_of_games=10000, first=1,
+                     chunk_size=2**16, utility_matrix=utility_matrix):
+    # Grid of "Control" strategies: {"p1", "p4", "gain", "valid",
+    # "strats" (a, b, 2, 2), "scores" (a, b, len(opponents), 2)}
+    p1g, p4g = np.meshgrid(np.asarray(p1_values, dtype=float), np.asarray(p4_values, dtype=float), indexing="ij")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p2g, p3g, gain = zd_control_params(p1g, p4g)
+    strats = np.stack([np.stack([p1g, p2g], axis=-1), np.stack([p3g, p4g], axis=-1)], axis=-2)
+    valid = _valid_probabilities(strats) & (1 - p1g + p4g > 0)
+    scores = np.full(valid.shape + (len(opponents), 2), np.nan)
+    scores[valid] = _score_candidates(strats[valid], first, opponents, nb_of_games, chunk_size, utility_matrix)
+    return {"p1": p1g, "p4": p4g, "gain": np.where(valid, gain, np.nan), "valid": valid,
+            "strats": strats, "scores": scores}
+
+def zd_extortion_sweep(chi_values, opponents=liste_strat, nb_of_games=10000, first=1,
+                       chunk_size=2**16, utility_matrix=utility_matrix):
+    # "Extortion" strategies: {"chi", "valid", "strats" (c, 2, 2), "scores" (c, len(opponents), 2)}
+    chi_values = np.asarray(chi_values, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        (_, q1, q2, q3, q4) = zd_extortion_params(chi_values)
+    strats = np.stack([np.stack([q1, q2], axis=-1), np.stack([q3, q4], axis=-1)], axis=-2)
+    valid = _valid_probabilities(strats) & (chi_values >= 1)
+    scores = np.full(valid.shape + (len(opponents), 2), np.nan)
+    scores[valid] = _score_candidates(strats[valid], first, opponents, nb_of_games, chunk_size, utility_matrix)
+    return {"chi": chi_values, "valid": valid, "strats": strats, "scores": scores}
+
+# ================== Sweep of a strategy source ================== #
+
+def source_sweep(source, opponents=liste_strat, nb_of_games=10000, utility_matrix=utility_matrix):
+    # Every strategy of a source (sources.py) scored exactly against the
+    # opponents, one chunk at a time: {"scores" (n, len(opponents), 2),
+    # "mean" (n,) mean score over the opponents}. Strategies that are not
+    # probabilities get NaN, as in the ZD sweeps.
+    parts = []
+    for (strats, firsts, _) in source:
+        scores = np.full((len(firsts), len(opponents), 2), np.nan)
+        valid = _valid_probabilities(strats) & (firsts >= 0) & (firsts <= 1)
+        scores[valid] = _score_candidates(strats[valid], firsts[valid], opponents, nb_of_games, max(len(firsts), 1)*len(opponents),
+                                          utility_matrix)
+        parts.append(scores)
+    scores = np.concatenate(parts) if parts else np.zeros((0, len(opponents), 2))
+    return {"scores": scores, "mean": scores[..., 0].mean(axis=-1)}